@@ -1,43 +1,275 @@
-from flask import Flask, request, jsonify
+import json
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import numpy as np
 import faiss
-import pandas as pd
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+import settings
+sys.path.insert(0, settings.PIPELINE_DIR)
+from doc_store import DOC_STORE_DIR, DocStore
+from index_utils import EXHAUSTIVE_TYPES, IdFilter, load_index, params_path, rescored_search
+from cache import ArtifactWatcher, LRUCache, embedding_key, normalize_query
+from encoder import BatchingEncoder
+from doc_features import FEATURES_FILE, FEATURES_META_FILE, filter_mask, load_features
+from lexical_index import LEXICAL_DIR, LexicalIndex
+from onnx_encoder import load_encoder
+from ranking import Ranker
+
+def set_compute_threads(threads):
+    """Cap the threads the model and FAISS use in this process"""
+    faiss.omp_set_num_threads(threads)
+    if hasattr(model, 'set_num_threads'):
+        model.set_num_threads(threads)
+    elif 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
 
 # --- 1. INITIALIZATION ---
 print("Loading all models and data...")
-model = SentenceTransformer('all-MiniLM-L6-v2')
-index = faiss.read_index('../nlp_pipeline/faiss_index.bin')
-df = pd.read_csv('../nlp_pipeline/all_data.csv')
+# PyTorch SentenceTransformer, or the int8 ONNX export (no torch import)
+model = load_encoder(settings.ENCODER_BACKEND, settings.MODEL_NAME, settings.ONNX_MODEL_DIR)
+# Concurrent requests share one batched forward pass instead of one each
+query_encoder = BatchingEncoder(
+    model,
+    batch_window_ms=settings.ENCODER_BATCH_WINDOW_MS,
+    max_batch_size=settings.ENCODER_MAX_BATCH_SIZE,
+)
+
+INDEX_PATH = os.path.join(settings.PIPELINE_DIR, 'faiss_index.bin')
+EMBEDDINGS_PATH = os.path.join(settings.PIPELINE_DIR, 'embeddings.npy')
+DATA_PATHS = [os.path.join(settings.PIPELINE_DIR, name)
+              for name in ('all_data.parquet', 'all_data.csv', FEATURES_FILE, FEATURES_META_FILE,
+                           os.path.join(LEXICAL_DIR, 'meta.json'), os.path.join(DOC_STORE_DIR, 'columns.json'))]
+# Source / keyword / recency boosts per role
+ranker = Ranker.from_file(settings.RANKING_CONFIG)
+
+# Everything read from the pipeline's output, as one immutable snapshot. A
+# reload builds a new snapshot and swaps it in with a single assignment, and
+# each request binds the snapshot once, so it never pairs one build's index
+# with another build's documents. `generation` goes into cache keys, so
+# entries a request stores from an old snapshot are never served for a new one.
+SearchData = namedtuple('SearchData', ['generation', 'index', 'index_params', 'doc_store', 'features',
+                                       'scorer', 'embeddings', 'lexical'])
+
+def load_search_data(generation=0):
+    # Whatever index type the build step produced (Flat, IVF, HNSW), with its
+    # saved nprobe/efSearch unless overridden in settings
+    index, index_params = load_index(INDEX_PATH, settings.FAISS_NPROBE, settings.FAISS_EF_SEARCH,
+                                     mmap=bool(settings.FAISS_MMAP), rescore_factor=settings.FAISS_RESCORE)
+    index_params['mmap'] = bool(settings.FAISS_MMAP)
+    # Only the displayed fields are kept, packed into a compact column store
+    # whose row i is FAISS id i; memory-mapped from doc_store/ once the
+    # pipeline has saved it
+    doc_store = DocStore.load(settings.PIPELINE_DIR)
+    # Ranking features (source code, keyword bits, date, ...) per FAISS id,
+    # memory-mapped from the pipeline's doc_features.npy
+    features, features_meta = load_features(settings.PIPELINE_DIR, ranker.keyword_groups)
+    # Row i is doc id i's vector; read only for exact scoring of selective
+    # filters and for re-scoring the candidates of compressed indexes
+    embeddings = np.load(EMBEDDINGS_PATH, mmap_mode='r') if os.path.exists(EMBEDDINGS_PATH) else None
+    # BM25 postings for exact terms (titles, version numbers, studios); None if not built
+    lexical = LexicalIndex.load(settings.PIPELINE_DIR)
+    return SearchData(generation, index, index_params, doc_store, features, ranker.bind(features_meta),
+                      embeddings, lexical)
+
+search_data = load_search_data()
+# The lexical lookup runs here while the request thread encodes and searches FAISS
+lexical_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='lexical')
+
+# Repeated queries skip the model (embedding cache) or the whole search
+# (result cache). Results are dropped when the pipeline rebuilds its output;
+# query embeddings only depend on the model, so they stay valid.
+embedding_cache = LRUCache(settings.CACHE_MAX_EMBEDDINGS, settings.CACHE_TTL_SECONDS)
+result_cache = LRUCache(settings.CACHE_MAX_RESULTS, settings.CACHE_TTL_SECONDS)
+# Filter -> IdFilter (id bitmap, or the matching ids when only a few match)
+filter_cache = LRUCache(settings.CACHE_MAX_FILTERS, settings.CACHE_TTL_SECONDS)
+artifact_watcher = ArtifactWatcher(
+    [INDEX_PATH, params_path(INDEX_PATH)] + DATA_PATHS, settings.ARTIFACT_CHECK_INTERVAL
+)
+if settings.COMPUTE_THREADS:
+    set_compute_threads(settings.COMPUTE_THREADS)
 print("Initialization Complete. API is ready.")
 
+def refresh_if_rebuilt():
+    """The current SearchData, reloaded first if the pipeline rewrote its output"""
+    global search_data
+    if not artifact_watcher.changed():
+        return search_data
+    print("Pipeline output changed on disk, reloading index and data...")
+    try:
+        new_data = load_search_data(search_data.generation + 1)
+    except Exception as e:
+        # Probably caught the files mid-write; try again on a later check
+        print(f"Reload failed, keeping the previous index: {e}")
+        artifact_watcher.reset()
+        return search_data
+    search_data = new_data
+    result_cache.clear()
+    filter_cache.clear()
+    return new_data
+
+def encode_query(query):
+    key = normalize_query(query)
+    query_embedding = embedding_cache.get(key)
+    if query_embedding is None:
+        query_embedding = query_encoder.encode([key])
+        embedding_cache.put(key, query_embedding)
+    return query_embedding
+
+def encode_queries(queries):
+    """(len(queries), d) embeddings: cache hits, and one model.encode call for the rest
+
+    A batch is large already, so it skips the micro-batching queue.
+    """
+    keys = [normalize_query(query) for query in queries]
+    found = {key: embedding_cache.get(key) for key in keys}
+    missing = [key for key, vector in found.items() if vector is None]
+    if missing:
+        encoded = np.asarray(model.encode(missing, batch_size=settings.BATCH_ENCODE_SIZE), dtype='float32')
+        for i, key in enumerate(missing):
+            found[key] = encoded[i:i + 1]
+            embedding_cache.put(key, found[key])
+    return np.vstack([found[key] for key in keys])
+
+def parse_query(data):
+    """(query, role) from a request body; ValueError if either is missing or not a string"""
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    query = data.get('query')
+    role = data.get('role', 'gamer')
+    if not query:
+        raise ValueError("Query is missing")
+    if not isinstance(query, str):
+        raise ValueError("query must be a string")
+    if not isinstance(role, str):
+        raise ValueError("role must be a string")
+    return query, role
+
+def parse_time(value):
+    """Epoch seconds from a number or an ISO 8601 date/time (UTC unless it says otherwise)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    parsed = datetime.fromisoformat(str(value))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def parse_filters(data, role):
+    """Hashable filter key from the request, or None when nothing is filtered.
+
+    sources    only these sources (case-insensitive)
+    date_from  only documents published at or after this time
+    date_to    ... and at or before this time
+    role_only  only documents the role's ranking rules boost
+    """
+    sources = data.get('sources')
+    if isinstance(sources, str):
+        sources = [sources]
+    if sources is not None:
+        if not isinstance(sources, list) or not all(isinstance(name, str) for name in sources):
+            raise ValueError("sources must be a list of source names")
+        sources = tuple(sorted({name.strip().lower() for name in sources}))
+    key = (sources, parse_time(data.get('date_from')), parse_time(data.get('date_to')),
+           role if data.get('role_only') else None)
+    return key if any(part is not None for part in key) else None
+
+def get_filter(data, key):
+    """IdFilter for a filter key; the mask is built once and cached"""
+    cache_key = (data.generation, key)
+    id_filter = filter_cache.get(cache_key)
+    if id_filter is None:
+        sources, date_from, date_to, role = key
+        mask = filter_mask(data.features, data.scorer.meta, sources, date_from, date_to)
+        if role is not None:
+            role_mask = data.scorer.role_mask(role, data.features)
+            if role_mask is not None:
+                mask &= role_mask
+        # Approximate indexes score very selective filters exactly from embeddings.npy
+        exact_max = 0 if data.index_params['index_type'] in EXHAUSTIVE_TYPES else settings.FILTER_EXACT_MAX
+        id_filter = IdFilter(mask, exact_max)
+        filter_cache.put(cache_key, id_filter)
+    return id_filter
+
+def merge_lexical(data, ids, distances, lexical_ids, lexical_scores, query_embedding):
+    """Add the lexical hits to the FAISS candidates: (ids, distances, BM25 scores)"""
+    extra = np.setdiff1d(lexical_ids, ids)
+    if len(extra) and data.embeddings is not None and len(data.embeddings) > extra[-1]:
+        # Same squared L2 distance FAISS would report
+        extra_distances = ((data.embeddings[extra] - query_embedding) ** 2).sum(axis=1)
+    else:
+        # No vector to compare against: no similarity credit
+        extra_distances = np.full(len(extra), 2.0, dtype=np.float32)
+    ids = np.concatenate([ids, extra])
+    distances = np.concatenate([distances, extra_distances.astype(np.float32)])
+    bm25 = np.zeros(len(ids), dtype=np.float32)
+    if len(lexical_ids):
+        # Position of each lexical hit among the merged candidates
+        sorter = np.argsort(ids)
+        bm25[sorter[np.searchsorted(ids, lexical_ids, sorter=sorter)]] = lexical_scores
+    return ids, distances, bm25
+
+def merge_candidates(data, indices, distances, lexical_hits, query_embedding):
+    """One query's FAISS neighbours plus its lexical hits: (ids, distances, BM25 scores or None)"""
+    # FAISS pads with -1 when it finds fewer than k neighbours
+    size = min(len(data.doc_store), len(data.features))
+    found = (indices >= 0) & (indices < size)
+    ids, distances = indices[found], distances[found]
+    if lexical_hits is None:
+        return ids, distances, None
+    lexical_ids, lexical_scores = lexical_hits
+    in_range = lexical_ids < size
+    return merge_lexical(data, ids, distances, lexical_ids[in_range], lexical_scores[in_range], query_embedding)
+
 # --- 2. THE RANKING FUNCTION (OUR "ML" MODEL) ---
-def rank_results(results, role):
-    developer_keywords = ['job', 'developer', 'engineer', 'programmer', 'artist', 'designer']
-    gamer_keywords = ['review', 'guide', 'gameplay', 'news', 'update']
-
-    ranked_results = []
-    for result in results:
-        score = result['distance'] 
-        title = str(result['title']).lower()
-
-        if role == 'developer':
-            if result['source'] == 'WorkWithIndies':
-                score += 0.5
-            if any(keyword in title for keyword in developer_keywords):
-                score += 0.2
-        
-        elif role == 'gamer':
-            if result['source'] in ['IGN', 'GameSpot', 'Reddit']:
-                score += 0.2
-            if any(keyword in title for keyword in gamer_keywords):
-                score += 0.1
+def rank_results(data, ids, distances, role, top_n, lexical_scores=None):
+    """Re-rank candidates with the configured boosts; best top_n as dicts"""
+    # Only array lookups for the candidates; text is read for the returned hits
+    order, scores = data.scorer.rank(role, distances, data.features[ids], lexical_scores)
+    top = order[:top_n]
+    return result_dicts(data.doc_store, ids[top], distances[top], scores[top],
+                        None if lexical_scores is None else lexical_scores[top])
 
-        result['score'] = score
-        ranked_results.append(result)
+def rank_batch(data, candidates, role, top_ns):
+    """rank_results for several queries of one role, scored as one padded array.
+
+    `candidates` holds each query's (ids, distances, BM25 scores or None).
+    Returns each query's best (ids, distances, scores, BM25 scores or None).
+    """
+    width = max(len(ids) for ids, _, _ in candidates)
+    ids = np.full((len(candidates), width), -1, dtype=np.int64)
+    # Padding sits at the largest distance unit vectors can have
+    distances = np.full((len(candidates), width), 4.0, dtype=np.float32)
+    bm25 = None if candidates[0][2] is None else np.zeros((len(candidates), width), dtype=np.float32)
+    for row, (row_ids, row_distances, row_bm25) in enumerate(candidates):
+        ids[row, :len(row_ids)] = row_ids
+        distances[row, :len(row_ids)] = row_distances
+        if bm25 is not None:
+            bm25[row, :len(row_ids)] = row_bm25
+    order, scores = data.scorer.rank(role, distances, data.features[np.maximum(ids, 0)], bm25)
+    ranked = []
+    for row, top_n in enumerate(top_ns):
+        top = order[row][ids[row, order[row]] >= 0][:top_n]
+        ranked.append((ids[row, top], distances[row, top], scores[row, top],
+                       None if bm25 is None else bm25[row, top]))
+    return ranked
 
-    return sorted(ranked_results, key=lambda x: x['score'])
+def result_dicts(store, ids, distances, scores, bm25=None):
+    """Ranked hits as the dicts the API returns"""
+    results = store.gather(ids)
+    for result, distance, score in zip(results, distances.tolist(), scores.tolist()):
+        result['distance'] = distance
+        result['score'] = score
+    if bm25 is not None:
+        for result, value in zip(results, bm25.tolist()):
+            result['bm25'] = value
+    return results
 
 # --- 3. FLASK API SETUP ---
 app = Flask(__name__)
@@ -45,36 +277,179 @@ CORS(app)
 
 @app.route('/search', methods=['POST'])
 def search():
-    data = request.json
-    query = data.get('query')
-    role = data.get('role', 'gamer')
-    
-    if not query:
-        return jsonify({"error": "Query is missing"}), 400
-
-    query_embedding = model.encode([query])
-    k = 20
-    distances, indices = index.search(query_embedding.astype('float32'), k)
-    
-    initial_results = []
-    for i, idx in enumerate(indices[0]):
-        # *** THIS IS THE FIX ***
-        # Get the summary and check if it's NaN. If so, replace with an empty string.
-        summary = df.iloc[idx].get('summary', '')
-        if pd.isna(summary):
-            summary = ''
-
-        initial_results.append({
-            "title": df.iloc[idx]['title'],
-            "url": df.iloc[idx]['url'],
-            "source": df.iloc[idx]['source'],
-            "summary": summary, # Use the cleaned summary
-            "distance": float(distances[0][i]) 
-        })
-    
-    final_results = rank_results(initial_results, role)
-
-    return jsonify(final_results[:5])
+    data = request.get_json(silent=True)
+    try:
+        query, role = parse_query(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        filter_key = parse_filters(data, role)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid filter: {e}"}), 400
+
+    # Bound once; a reload by another request does not affect this one
+    data = refresh_if_rebuilt()
+    id_filter = None
+    if filter_key is not None:
+        id_filter = get_filter(data, filter_key)
+        if id_filter.matches == 0:
+            return jsonify([])
+    # The lexical text is exactly what the embedding is keyed on, so cached
+    # results stay valid for it
+    lexical_search = None
+    if data.lexical is not None and settings.LEXICAL_CANDIDATES > 0:
+        lexical_search = lexical_pool.submit(
+            data.lexical.search, normalize_query(query), settings.LEXICAL_CANDIDATES,
+            id_filter.contains if id_filter is not None else None,
+        )
+
+    query_embedding = encode_query(query)
+    cache_key = (data.generation, embedding_key(query_embedding), role, filter_key)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return jsonify(cached)
+
+    if id_filter is None:
+        distances, indices = rescored_search(data.index, query_embedding, settings.SEARCH_CANDIDATES,
+                                             data.embeddings, data.index_params['rescore'])
+    else:
+        # Filtered inside FAISS: non-matching ids are skipped during the scan,
+        # so the k candidates are all valid without over-fetching
+        distances, indices = id_filter.search(data.index, query_embedding, settings.SEARCH_CANDIDATES,
+                                              data.embeddings, data.index_params['rescore'])
+
+    lexical_hits = lexical_search.result() if lexical_search is not None else None
+    ids, distances, bm25 = merge_candidates(data, indices[0], distances[0], lexical_hits, query_embedding[0])
+    final_results = rank_results(data, ids, distances, role, settings.SEARCH_RESULTS, bm25)
+    result_cache.put(cache_key, final_results)
+
+    return jsonify(final_results)
+
+def parse_batch_item(item):
+    """(query, role, k, filter key) of one /search/batch entry"""
+    if isinstance(item, str):
+        item = {'query': item}
+    if not isinstance(item, dict):
+        raise ValueError("Each entry must be a query string or an object")
+    query, role = parse_query(item)
+    k = item.get('k', settings.SEARCH_RESULTS)
+    if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= settings.BATCH_MAX_K:
+        raise ValueError(f"k must be an integer from 1 to {settings.BATCH_MAX_K}")
+    try:
+        filter_key = parse_filters(item, role)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid filter: {e}")
+    return query, role, k, filter_key
+
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """Many /search queries in one request, answered as JSON lines in request order.
+
+    Body: {"queries": [{"query": ..., "role": ..., "k": ..., <filters as in /search>}, ...]},
+    where an entry may also be just the query string. Line i is
+    {"index": i, "results": [...]} or {"index": i, "error": "..."}.
+    """
+    body = request.get_json(silent=True)
+    items = body.get('queries') if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "queries must be a non-empty list"}), 400
+    if len(items) > settings.BATCH_MAX_QUERIES:
+        return jsonify({"error": f"At most {settings.BATCH_MAX_QUERIES} queries per batch"}), 400
+
+    # Bound once, so a reload while the response streams cannot mix two corpora
+    data = refresh_if_rebuilt()
+    # Per entry: an error / cached line, or ranked hits still to be read from the store
+    outputs = [None] * len(items)
+    cache_keys = [None] * len(items)
+    jobs, filters, lexical_searches = [], {}, {}
+    for i, item in enumerate(items):
+        try:
+            query, role, k, filter_key = parse_batch_item(item)
+        except ValueError as e:
+            outputs[i] = {"index": i, "error": str(e)}
+            continue
+        if filter_key is not None:
+            if filter_key not in filters:
+                filters[filter_key] = get_filter(data, filter_key)
+            if filters[filter_key].matches == 0:
+                outputs[i] = {"index": i, "results": []}
+                continue
+        if data.lexical is not None and settings.LEXICAL_CANDIDATES > 0:
+            lexical_searches[i] = lexical_pool.submit(
+                data.lexical.search, normalize_query(query), settings.LEXICAL_CANDIDATES,
+                filters[filter_key].contains if filter_key is not None else None,
+            )
+        jobs.append((i, query, role, k, filter_key))
+
+    vectors = encode_queries([query for _, query, _, _, _ in jobs]) if jobs else None
+    # Queries with the same filter share one multi-query FAISS search
+    groups = {}
+    for row, (i, _, role, k, filter_key) in enumerate(jobs):
+        if k == settings.SEARCH_RESULTS:
+            # Same key as /search, so the two endpoints share cached results
+            cache_keys[i] = (data.generation, embedding_key(vectors[row:row + 1]), role, filter_key)
+            cached = result_cache.get(cache_keys[i])
+            if cached is not None:
+                outputs[i] = {"index": i, "results": cached}
+                continue
+        groups.setdefault(filter_key, []).append(row)
+
+    candidates = {}
+    for filter_key, rows in groups.items():
+        # Each query is ranked over as many candidates as /search would use
+        widths = [max(settings.SEARCH_CANDIDATES, jobs[row][3]) for row in rows]
+        if filter_key is None:
+            distances, indices = rescored_search(data.index, vectors[rows], max(widths),
+                                                 data.embeddings, data.index_params['rescore'])
+        else:
+            distances, indices = filters[filter_key].search(data.index, vectors[rows], max(widths),
+                                                            data.embeddings, data.index_params['rescore'])
+        for n, (row, width) in enumerate(zip(rows, widths)):
+            i = jobs[row][0]
+            lexical_hits = lexical_searches[i].result() if i in lexical_searches else None
+            candidates[row] = merge_candidates(data, indices[n, :width], distances[n, :width],
+                                               lexical_hits, vectors[row])
+
+    # Each role's candidates are ranked together
+    roles = {}
+    for row in candidates:
+        roles.setdefault(jobs[row][2], []).append(row)
+    for role, rows in roles.items():
+        ranked = rank_batch(data, [candidates[row] for row in rows], role, [jobs[row][3] for row in rows])
+        for row, hits in zip(rows, ranked):
+            outputs[jobs[row][0]] = hits
+
+    def stream():
+        # Documents are read and serialized one query at a time
+        for i, output in enumerate(outputs):
+            if isinstance(output, tuple):
+                results = result_dicts(data.doc_store, *output)
+                if cache_keys[i] is not None:
+                    result_cache.put(cache_keys[i], results)
+                output = {"index": i, "results": results}
+            yield json.dumps(output) + '\n'
+
+    return Response(stream(), mimetype='application/x-ndjson')
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    data = search_data
+    return jsonify({
+        "encoder": dict(query_encoder.stats(), backend=settings.ENCODER_BACKEND),
+        "embedding_cache": embedding_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "filter_cache": filter_cache.stats(),
+        "index": dict(data.index_params, vectors=data.index.ntotal, generation=data.generation),
+        "doc_store": {"documents": len(data.doc_store), "bytes": data.doc_store.nbytes,
+                      "mmap": isinstance(next(iter(data.doc_store.columns.values()))[1], np.memmap)},
+        "lexical": None if data.lexical is None else dict(data.lexical.meta, bytes=data.lexical.nbytes,
+                                                          candidates=settings.LEXICAL_CANDIDATES),
+        "process": {"pid": os.getpid(), "compute_threads": faiss.omp_get_max_threads()},
+        "ranking": {"config": settings.RANKING_CONFIG, "roles": ranker.roles,
+                    "candidates": settings.SEARCH_CANDIDATES,
+                    "features_mmap": isinstance(data.features, np.memmap)},
+    })
 
 if __name__ == '__main__':
+    # Development server; for production see gunicorn.conf.py
     app.run(debug=True, port=5001)
\ No newline at end of file
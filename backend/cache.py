@@ -0,0 +1,121 @@
+# Query caches for the search API
+#
+# Traffic is dominated by a small set of repeated queries, so we keep two
+# bounded caches in front of the expensive work:
+#   1. normalized query text  -> query embedding   (skips the model)
+#   2. (embedding key, role)  -> final ranked list (skips FAISS + ranking)
+# Both are LRU with a TTL and are cleared whenever the pipeline rebuilds the
+# index or the corpus on disk.
+
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Canonical cache form of a query (the model is uncased)"""
+    query = unicodedata.normalize('NFKC', query)
+    return re.sub(r'\s+', ' ', query).strip().lower()
+
+
+def embedding_key(embedding):
+    """Short, stable key for an embedding vector"""
+    return hashlib.blake2b(embedding.tobytes(), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a per-entry time-to-live"""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class ArtifactWatcher:
+    """Detects when pipeline output files are rebuilt on disk"""
+
+    def __init__(self, paths, check_interval=5.0):
+        self.paths = list(paths)
+        self.check_interval = check_interval
+        self._signature = self._current_signature()
+        self._next_check = time.monotonic() + check_interval
+        self._lock = threading.Lock()
+
+    def _current_signature(self):
+        signature = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                signature.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return tuple(signature)
+
+    def changed(self):
+        """True once per rebuild; stat() is throttled to check_interval"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+            signature = self._current_signature()
+            if signature == self._signature:
+                return False
+            self._signature = signature
+            return True
+
+    def reset(self):
+        """Forget the last seen state so the next check reports a change"""
+        with self._lock:
+            self._signature = None
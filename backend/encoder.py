@@ -0,0 +1,125 @@
+# Micro-batching query encoder
+#
+# Flask serves each request on its own thread. Instead of every request
+# running its own single-sentence forward pass, requests drop their query
+# into a shared queue and wait. A background worker collects everything that
+# arrives within a short window (or until the batch is full) and encodes it
+# with one model.encode call, then hands each embedding back to its caller.
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram"""
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+            self.total += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"]
+            return {
+                'count': self.total,
+                'mean': self.sum / self.total if self.total else 0.0,
+                'buckets': dict(zip(labels, self.counts)),
+            }
+
+
+class BatchingEncoder:
+    """Gathers concurrent encode requests into batched model.encode calls"""
+
+    def __init__(self, model, batch_window_ms=2.0, max_batch_size=32):
+        self.model = model
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_wait_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100, 250])
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_pid = None
+        self._start_lock = threading.Lock()
+
+    def encode(self, texts):
+        """Encode a list of texts, returning a float32 array of shape (len(texts), d)"""
+        self._ensure_worker()
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future, time.perf_counter()))
+            futures.append(future)
+        return np.vstack([f.result() for f in futures])
+
+    def stats(self):
+        return {
+            'batch_window_ms': self.batch_window * 1000.0,
+            'max_batch_size': self.max_batch_size,
+            'batch_size': self.batch_sizes.snapshot(),
+            'queue_wait_ms': self.queue_wait_ms.snapshot(),
+        }
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so a pre-forked server worker starts
+        # its own batching thread on first use.
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is None or self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name='query-encoder', daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait_ms.observe((started - enqueued) * 1000.0)
+            self.batch_sizes.observe(len(batch))
+
+            texts = [text for text, _, _ in batch]
+            try:
+                embeddings = self.model.encode(texts, batch_size=len(texts))
+                embeddings = np.asarray(embeddings, dtype='float32')
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for i, (_, future, _) in enumerate(batch):
+                future.set_result(embeddings[i:i + 1])
@@ -0,0 +1,38 @@
+# gunicorn settings for serving the API with several worker processes:
+#     cd backend && gunicorn -c gunicorn.conf.py app:app
+#
+# The app is imported once in the master and the workers are forked from it
+# (preload_app), so they share the model weights copy-on-write. The FAISS
+# index, doc store, ranking features, embeddings and lexical index are all
+# memory-mapped from the pipeline directory, so N workers cost about one copy
+# of the data (run 3_build_index.py once to write doc_store/). Each worker
+# caps its model / FAISS threads at its share of the cores, so the workers
+# don't oversubscribe the CPU.
+#
+# Each worker still watches the pipeline output and reloads on its own.
+
+import os
+
+import settings
+
+cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+
+bind = settings.SERVER_BIND
+workers = settings.SERVER_WORKERS or cores
+worker_class = 'gthread'
+threads = settings.SERVER_THREADS
+preload_app = True
+# Model loading happens in the master, but a cold page cache can make the
+# first searches slow
+timeout = 120
+
+compute_threads = settings.COMPUTE_THREADS or max(1, cores // workers)
+# Read by OpenMP / BLAS when torch, numpy and faiss load in the master
+for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+    os.environ.setdefault(name, str(compute_threads))
+
+
+def post_fork(server, worker):
+    import app
+    app.set_compute_threads(compute_threads)
+    server.log.info(f"Worker {worker.pid}: {compute_threads} compute thread(s)")
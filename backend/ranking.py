@@ -0,0 +1,199 @@
+# Re-ranking of FAISS candidates for /search
+#
+# FAISS returns the k nearest candidates with their squared L2 distances. The
+# embeddings are unit length, so distance d corresponds to cosine similarity
+# 1 - d / 2. Each candidate's score is
+#
+#     similarity_weight * cosine + lexical_weight * bm25 / best bm25
+#         + source boost + keyword boosts + recency + popularity
+#
+# where bm25 is the candidate's score from the lexical index (0 when the
+# query's terms are not in it), scaled so the best lexical match of the
+# candidate pool gets the full lexical_weight. Candidates are returned best (highest score) first. The boosts are
+# looked up in the per-document feature table that the pipeline precomputes
+# (see nlp_pipeline/doc_features.py): source codes index a weight array,
+# keyword matches are bits, dates are epoch seconds. Every term is an array
+# operation over all k candidates, with no string work at query time. A
+# (queries, k) array of candidates is scored in one pass the same way, row
+# by row, as /search/batch does for all queries of one role.
+#
+# The rules live in ranking.json (see settings.RANKING_CONFIG) and are read
+# once at startup. Run this file to compare against the old per-result loop:
+#     python ranking.py --k 20 200 2000
+
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+import settings
+if settings.PIPELINE_DIR not in sys.path:
+    sys.path.insert(0, settings.PIPELINE_DIR)
+from doc_features import keyword_groups
+
+
+class RoleRules:
+    """One role's boosts, compiled against a feature table's source codes and keyword bits"""
+
+    def __init__(self, rules, meta):
+        boosts = {name.lower(): float(weight) for name, weight in rules.get('source_boosts', {}).items()}
+        # Boost per source code
+        self.source_weights = np.array([boosts.get(name, 0.0) for name in meta['sources']], dtype=np.float32)
+        if not self.source_weights.any():
+            self.source_weights = None
+        groups = [tuple(g) for g in meta['keyword_groups']]
+        self.keyword_bits = [(np.uint32(1 << groups.index(tuple(sorted({k.lower() for k in group['keywords']})))),
+                              float(group['weight']))
+                             for group in rules.get('keyword_boosts', [])]
+        recency = rules.get('recency') or {}
+        self.recency_weight = float(recency.get('weight', 0.0))
+        self.half_life = float(recency.get('half_life_days', 30)) * 86400.0
+        popularity = rules.get('popularity') or {}
+        self.popularity_weight = float(popularity.get('weight', 0.0))
+        self.popularity_scale = math.log1p(float(popularity.get('saturation', 1000)))
+
+
+class Scorer:
+    """Ranking rules bound to one feature table"""
+
+    def __init__(self, config, meta):
+        self.meta = meta
+        self.similarity_weight = float(config.get('similarity_weight', 1.0))
+        self.lexical_weight = float(config.get('lexical_weight', 0.0))
+        self.roles = {role: RoleRules(rules, meta) for role, rules in config.get('roles', {}).items()}
+
+    def score(self, role, distances, features, lexical=None, now=None):
+        """Scores for k candidates (higher is better), or for a (queries, k) array of them.
+
+        `features` are their feature rows and `lexical` their BM25 scores, if any.
+        """
+        distances = np.asarray(distances, dtype=np.float32)
+        scores = self.similarity_weight * (1.0 - distances / 2.0)
+        if lexical is not None and self.lexical_weight and np.size(lexical):
+            lexical = np.asarray(lexical, dtype=np.float32)
+            # Per query: its best lexical match gets the full weight
+            best = lexical.max(axis=-1, keepdims=True)
+            scores += np.divide(self.lexical_weight * lexical, best,
+                                out=np.zeros_like(lexical), where=best > 0)
+        rules = self.roles.get(role)
+        if rules is None or distances.size == 0:
+            return scores
+
+        if rules.source_weights is not None:
+            scores += rules.source_weights[features['source']]
+        if rules.keyword_bits:
+            keywords = features['keywords']
+            for bit, weight in rules.keyword_bits:
+                scores += weight * ((keywords & bit) != 0)
+        if rules.recency_weight:
+            now = time.time() if now is None else now
+            age = np.maximum(now - features['date'], 0.0)
+            # Halves every half_life; undated documents get no recency boost
+            recency = np.nan_to_num(np.exp2(-age / rules.half_life), nan=0.0)
+            scores += (rules.recency_weight * recency).astype(np.float32)
+        if rules.popularity_weight:
+            # log-scaled Reddit score, full boost at `saturation` upvotes
+            popularity = np.minimum(np.log1p(np.maximum(features['score'], 0)) / rules.popularity_scale, 1.0)
+            scores += (rules.popularity_weight * popularity).astype(np.float32)
+        return scores
+
+    def role_mask(self, role, features):
+        """Mask of the documents this role's rules boost (by source or keyword); None if it has no rules"""
+        rules = self.roles.get(role)
+        if rules is None:
+            return None
+        mask = np.zeros(len(features), dtype=bool)
+        if rules.source_weights is not None:
+            mask |= rules.source_weights[features['source']] > 0
+        bits = np.uint32(0)
+        for bit, weight in rules.keyword_bits:
+            if weight > 0:
+                bits |= bit
+        if bits:
+            mask |= (features['keywords'] & bits) != 0
+        return mask
+
+    def rank(self, role, distances, features, lexical=None, now=None):
+        """(order, scores): candidate positions best first (per row), and their scores"""
+        scores = self.score(role, distances, features, lexical, now)
+        # Stable, so ties keep FAISS's nearest-first order
+        order = np.argsort(-scores, axis=-1, kind='stable')
+        return order, scores
+
+
+class Ranker:
+    def __init__(self, config):
+        self.config = config
+        self.roles = sorted(config.get('roles', {}))
+        # Keyword groups the feature table must have a bit for
+        self.keyword_groups = keyword_groups(config)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def bind(self, meta):
+        """A Scorer for a feature table with this meta (its source table and keyword groups)"""
+        return Scorer(self.config, meta)
+
+
+def _legacy_rank(results, role):
+    """The previous per-result loop (adds boosts to the distance), for timing only"""
+    developer_keywords = ['job', 'developer', 'engineer', 'programmer', 'artist', 'designer']
+    gamer_keywords = ['review', 'guide', 'gameplay', 'news', 'update']
+    for result in results:
+        score = result['distance']
+        title = str(result['title']).lower()
+        if role == 'developer':
+            if result['source'] == 'WorkWithIndies':
+                score += 0.5
+            if any(keyword in title for keyword in developer_keywords):
+                score += 0.2
+        elif role == 'gamer':
+            if result['source'] in ['IGN', 'GameSpot', 'Reddit']:
+                score += 0.2
+            if any(keyword in title for keyword in gamer_keywords):
+                score += 0.1
+        result['score'] = score
+    return sorted(results, key=lambda x: x['score'])
+
+
+if __name__ == '__main__':
+    from doc_features import load_features
+    from doc_store import DocStore
+
+    parser = argparse.ArgumentParser(description="Time candidate re-ranking at several k on the current corpus")
+    parser.add_argument('--k', type=int, nargs='+', default=[20, 200, 2000])
+    parser.add_argument('--role', default='gamer')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    ranker = Ranker.from_file(settings.RANKING_CONFIG)
+    features, meta = load_features(settings.PIPELINE_DIR, ranker.keyword_groups)
+    scorer = ranker.bind(meta)
+    doc_store = DocStore.load(settings.PIPELINE_DIR)
+    rng = np.random.default_rng(0)
+
+    print(f"{'k':>6}{'loop ms':>10}{'features ms':>13}{'speedup':>9}")
+    for k in args.k:
+        # Candidates drawn from the corpus (with repeats when k > corpus size)
+        ids = rng.integers(0, len(doc_store), k)
+        distances = np.sort(rng.uniform(0.4, 1.6, k)).astype(np.float32)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            results = doc_store.gather(ids)
+            for result, distance in zip(results, distances.tolist()):
+                result['distance'] = distance
+            _legacy_rank(results, args.role)
+        loop_ms = (time.perf_counter() - start) * 1000 / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            scorer.rank(args.role, distances, features[ids])
+        features_ms = (time.perf_counter() - start) * 1000 / args.repeat
+        print(f"{k:>6}{loop_ms:>10.3f}{features_ms:>13.3f}{loop_ms / features_ms:>9.2f}")
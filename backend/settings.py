@@ -0,0 +1,87 @@
+# Settings for the search API
+#
+# Every value can be overridden with an environment variable of the same
+# name, e.g. `set ENCODER_BATCH_WINDOW_MS=5` before running `python app.py`.
+
+import os
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+# Where the NLP pipeline writes its artifacts (index, embeddings, corpus)
+PIPELINE_DIR = os.getenv(
+    'PIPELINE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'nlp_pipeline'),
+)
+
+MODEL_NAME = os.getenv('MODEL_NAME', 'all-MiniLM-L6-v2')
+# 'torch' runs MODEL_NAME with sentence-transformers; 'onnx' runs the int8
+# export from `python onnx_encoder.py export` with ONNX Runtime instead
+ENCODER_BACKEND = os.getenv('ENCODER_BACKEND', 'torch')
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', os.path.join(PIPELINE_DIR, 'onnx_model'))
+
+# --- Query encoder micro-batching ---
+# Queries that arrive within this window (milliseconds) are encoded together
+# in a single model.encode call. 0 disables waiting: whatever is queued when
+# the worker wakes up is encoded immediately.
+ENCODER_BATCH_WINDOW_MS = _env_float('ENCODER_BATCH_WINDOW_MS', 2.0)
+# A batch is flushed as soon as it reaches this many queries
+ENCODER_MAX_BATCH_SIZE = _env_int('ENCODER_MAX_BATCH_SIZE', 32)
+
+# --- Query caches ---
+CACHE_MAX_EMBEDDINGS = _env_int('CACHE_MAX_EMBEDDINGS', 10000)
+CACHE_MAX_RESULTS = _env_int('CACHE_MAX_RESULTS', 5000)
+CACHE_TTL_SECONDS = _env_float('CACHE_TTL_SECONDS', 600)
+# Id bitmaps of recently used /search filters
+CACHE_MAX_FILTERS = _env_int('CACHE_MAX_FILTERS', 256)
+# How often (seconds) to check whether the index/corpus files were rebuilt
+ARTIFACT_CHECK_INTERVAL = _env_float('ARTIFACT_CHECK_INTERVAL', 5)
+
+# --- FAISS search-time knobs ---
+# Override the values 3_build_index.py saved in faiss_index.json (0 = use saved)
+FAISS_NPROBE = _env_int('FAISS_NPROBE', 0)
+FAISS_EF_SEARCH = _env_int('FAISS_EF_SEARCH', 0)
+# Compressed indexes (sq8 / sqfp16 / ivfpq / PCA): candidates fetched per
+# result and re-scored exactly from embeddings.npy (0 = use saved)
+FAISS_RESCORE = _env_int('FAISS_RESCORE', 0)
+# Memory-map the index file read-only instead of reading it into the process;
+# server workers then share one copy through the page cache
+FAISS_MMAP = _env_int('FAISS_MMAP', 1)
+# With an approximate index, filtered searches matching at most this many
+# documents score their vectors directly instead of walking the index
+FILTER_EXACT_MAX = _env_int('FILTER_EXACT_MAX', 4096)
+
+# --- Ranking ---
+# Re-ranking rules (source / keyword / recency boosts per role), read at startup
+RANKING_CONFIG = os.getenv(
+    'RANKING_CONFIG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ranking.json')
+)
+# Nearest neighbours fetched from FAISS and re-ranked, and how many are returned
+SEARCH_CANDIDATES = _env_int('SEARCH_CANDIDATES', 20)
+SEARCH_RESULTS = _env_int('SEARCH_RESULTS', 5)
+# BM25 matches from the lexical index added to the FAISS candidates (0 = vector search only)
+LEXICAL_CANDIDATES = _env_int('LEXICAL_CANDIDATES', 50)
+
+# --- /search/batch ---
+# Queries per request and results per query
+BATCH_MAX_QUERIES = _env_int('BATCH_MAX_QUERIES', 1000)
+BATCH_MAX_K = _env_int('BATCH_MAX_K', 100)
+# The batch's queries go to the model in one encode call, this many
+# sentences per forward pass (larger passes pad more and are not faster)
+BATCH_ENCODE_SIZE = _env_int('BATCH_ENCODE_SIZE', 32)
+
+# --- Production serving: gunicorn -c gunicorn.conf.py app:app ---
+SERVER_BIND = os.getenv('SERVER_BIND', '0.0.0.0:5001')
+# Worker processes (0 = one per CPU core)
+SERVER_WORKERS = _env_int('SERVER_WORKERS', 0)
+# Request threads per worker; concurrent requests in a worker share encoder batches
+SERVER_THREADS = _env_int('SERVER_THREADS', 8)
+# Threads the model and FAISS may use inside each process for one batch/search
+# (0 = the CPU cores divided among the workers, at least 1)
+COMPUTE_THREADS = _env_int('COMPUTE_THREADS', 0)
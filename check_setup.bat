@@ -12,7 +12,7 @@ if exist "venv\Scripts\activate.bat" (
 ) else (
     echo ❌ Virtual environment missing
     echo Run: python -m venv venv
-    echo Then: pip install scrapy requests beautifulsoup4
+    echo Then: pip install scrapy requests beautifulsoup4 lxml
 )
 
 echo.
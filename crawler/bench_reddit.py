@@ -0,0 +1,151 @@
+# Offline benchmark for reddit_news.py
+#
+# Starts a local stand-in for the Reddit API (OAuth token endpoint plus
+# /r/<sub>/new and /r/<sub>/hot listings, with per-request latency and
+# x-ratelimit-* headers). The real PRAW client is pointed at it, and several
+# runs are simulated with new posts arriving in between. Both the old fetch
+# (sequential, `hot`) and the new one (parallel, `new` + watermarks) are
+# compared on fetch time and on how many posts each run downloads that were
+# already stored.
+#
+#     python bench_reddit.py --runs 3 --latency 0.2 --posts-between-runs 5
+
+import argparse
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import praw
+
+import reddit_news
+
+
+class FakeReddit:
+    """Posts per subreddit, newest last; add_posts() simulates time passing"""
+
+    def __init__(self, subreddits, initial_posts=60):
+        self.posts = {sub: [] for sub in subreddits}
+        self.clock = 1_700_000_000.0
+        self.next_id = 0
+        self.requests = 0
+        self.served = 0
+        self.lock = threading.Lock()
+        self.add_posts(initial_posts)
+
+    def add_posts(self, count):
+        with self.lock:
+            for sub, posts in self.posts.items():
+                for _ in range(count):
+                    self.clock += 37
+                    self.next_id += 1
+                    post_id = format(self.next_id, 'x')
+                    posts.append({
+                        'id': post_id, 'name': f't3_{post_id}', 'title': f'{sub} post {post_id}',
+                        'url': f'https://example.com/{sub}/{post_id}', 'permalink': f'/r/{sub}/comments/{post_id}/',
+                        'score': (self.next_id * 7919) % 1000, 'num_comments': self.next_id % 50,
+                        'created_utc': self.clock, 'subreddit': sub,
+                    })
+
+    def listing(self, sub, kind, limit, after):
+        with self.lock:
+            self.requests += 1
+            posts = list(reversed(self.posts.get(sub, [])))
+        if kind == 'hot':
+            # Recent posts, ordered by score
+            posts = sorted(posts[:100], key=lambda p: -p['score'])
+        start = 0
+        if after:
+            names = [p['name'] for p in posts]
+            start = names.index(after) + 1 if after in names else len(posts)
+        page = posts[start:start + limit]
+        with self.lock:
+            self.served += len(page)
+        more = start + limit < len(posts)
+        return {'kind': 'Listing', 'data': {
+            'children': [{'kind': 't3', 'data': p} for p in page],
+            'after': page[-1]['name'] if page and more else None, 'before': None,
+        }}
+
+
+def make_handler(fake, latency):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('x-ratelimit-remaining', '590')
+            self.send_header('x-ratelimit-used', '10')
+            self.send_header('x-ratelimit-reset', '300')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self._send({'access_token': 'fake', 'token_type': 'bearer', 'expires_in': 3600, 'scope': '*'})
+
+        def do_GET(self):
+            time.sleep(latency)
+            url = urlparse(self.path)
+            parts = url.path.strip('/').split('/')
+            query = parse_qs(url.query)
+            if len(parts) == 3 and parts[0] == 'r' and parts[2] in ('new', 'hot'):
+                self._send(fake.listing(parts[1], parts[2], int(query.get('limit', ['25'])[0]),
+                                        query.get('after', [None])[0]))
+            else:
+                self.send_error(404)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def run(label, server_url, fake, posts_between_runs, runs, **options):
+    with tempfile.TemporaryDirectory() as output_dir:
+        factory = lambda: praw.Reddit(
+            client_id='bench', client_secret='bench', user_agent='bench_reddit/1.0',
+            oauth_url=server_url, reddit_url=server_url, check_for_updates=False, check_for_async=False)
+        rows = []
+        for i in range(runs):
+            if i:
+                fake.add_posts(posts_between_runs)
+            requests, served = fake.requests, fake.served
+            start = time.perf_counter()
+            new = reddit_news.main(output_dir=output_dir, reddit_factory=factory, **options)
+            rows.append((time.perf_counter() - start, fake.requests - requests,
+                         fake.served - served, new))
+    return label, rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark reddit_news.py against a local fake Reddit API")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.2, help="Seconds per listing request")
+    parser.add_argument('--posts-between-runs', type=int, default=5, help="New posts per subreddit between runs")
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    results = []
+    for label, options in [
+        ("sequential hot (old)", dict(listing='hot', workers=1)),
+        (f"{args.workers} workers, new + watermark", dict(listing='new', workers=args.workers)),
+    ]:
+        fake = FakeReddit(reddit_news.SUBREDDITS)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(fake, args.latency))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            results.append(run(label, f'http://127.0.0.1:{server.server_port}', fake,
+                               args.posts_between_runs, args.runs, **options))
+        finally:
+            server.shutdown()
+
+    print(f"\n--- {len(reddit_news.SUBREDDITS)} subreddits, {args.latency * 1000:.0f} ms per request, "
+          f"{args.posts_between_runs} new posts per subreddit between runs ---")
+    print(f"{'mode':<32}{'run':>4}{'seconds':>9}{'requests':>10}{'downloaded':>12}{'new':>6}{'already saved':>15}")
+    for label, rows in results:
+        for i, (seconds, requests, downloaded, new) in enumerate(rows, 1):
+            print(f"{label:<32}{i:>4}{seconds:>9.2f}{requests:>10}{downloaded:>12}{new:>6}{downloaded - new:>15}")
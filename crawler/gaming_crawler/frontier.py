@@ -0,0 +1,139 @@
+# Crawl frontiers for GamingDeepCrawler
+#
+# A frontier holds the URLs waiting to be crawled (one FIFO per domain), the
+# set of URLs already queued, and per-site counts of saved pages. Frontier
+# keeps all of that in memory. SqliteFrontier keeps it in a SQLite file
+# instead and commits a checkpoint every few seconds. An interrupted crawl can
+# then resume where it stopped, and large crawls do not have to hold every URL
+# in RAM. Queued URLs are remembered as 64-bit fingerprints, not full URLs.
+# The pages themselves go to a JsonlSink as they are scraped.
+
+import hashlib
+import json
+import sqlite3
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlparse
+
+
+def url_fingerprint(url):
+    """Signed 64-bit hash of a URL (fits a SQLite INTEGER)"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+class Frontier:
+    """In-memory crawl frontier: one FIFO queue of (url, depth) per domain"""
+
+    def __init__(self):
+        self.queues = defaultdict(deque)
+        self.seen = set()
+        self.saved = 0
+        self.site_counts = {}
+        self.resumed = False
+
+    def push(self, url, depth):
+        """Queue a URL unless it was queued before; returns True if queued"""
+        fp = url_fingerprint(url)
+        if fp in self.seen:
+            return False
+        self.seen.add(fp)
+        self.queues[urlparse(url).netloc].append((url, depth))
+        return True
+
+    def pop(self, domain):
+        queue = self.queues.get(domain)
+        return queue.popleft() if queue else None
+
+    def done(self, url):
+        """Mark a popped URL as finished"""
+
+    def drop(self, domain):
+        """Discard everything still queued for a domain"""
+        self.queues.pop(domain, None)
+
+    def domains(self):
+        return [domain for domain, queue in self.queues.items() if queue]
+
+    def checkpoint(self, force=False, flush=None):
+        if flush is not None:
+            flush()
+
+    def finish(self, flush=None):
+        self.checkpoint(flush=flush)
+
+
+class SqliteFrontier:
+    """Disk-backed frontier that checkpoints periodically and can resume"""
+
+    def __init__(self, path, checkpoint_interval=10.0):
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY, depth INTEGER, domain TEXT,
+                in_flight INTEGER DEFAULT 0, seq INTEGER);
+            CREATE INDEX IF NOT EXISTS frontier_domain ON frontier (domain, in_flight, seq);
+            CREATE TABLE IF NOT EXISTS seen (fp INTEGER PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        if meta.get('finished') == '1':
+            # The last crawl completed and was saved: start a new one
+            self.db.executescript("DELETE FROM frontier; DELETE FROM seen; DELETE FROM meta;")
+            meta = {}
+        self.resumed = bool(meta)
+        self.saved = int(meta.get('saved', 0))
+        self.site_counts = json.loads(meta.get('site_counts', '{}'))
+        # Pages that were being fetched when the last run stopped go back in the queue
+        self.db.execute("UPDATE frontier SET in_flight = 0")
+        self._seq = self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM frontier").fetchone()[0]
+        self._last_checkpoint = time.monotonic()
+        self.checkpoint(force=True)
+
+    def push(self, url, depth):
+        cursor = self.db.execute("INSERT OR IGNORE INTO seen (fp) VALUES (?)", (url_fingerprint(url),))
+        if cursor.rowcount == 0:
+            return False
+        self._seq += 1
+        self.db.execute("INSERT OR IGNORE INTO frontier (url, depth, domain, seq) VALUES (?, ?, ?, ?)",
+                        (url, depth, urlparse(url).netloc, self._seq))
+        return True
+
+    def pop(self, domain):
+        row = self.db.execute(
+            "SELECT url, depth FROM frontier WHERE domain = ? AND in_flight = 0 ORDER BY seq LIMIT 1",
+            (domain,)).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE frontier SET in_flight = 1 WHERE url = ?", (row[0],))
+        return row[0], row[1]
+
+    def done(self, url):
+        self.db.execute("DELETE FROM frontier WHERE url = ?", (url,))
+
+    def drop(self, domain):
+        self.db.execute("DELETE FROM frontier WHERE domain = ? AND in_flight = 0", (domain,))
+
+    def domains(self):
+        return [row[0] for row in self.db.execute("SELECT DISTINCT domain FROM frontier WHERE in_flight = 0")]
+
+    def checkpoint(self, force=False, flush=None):
+        """Commit progress if the checkpoint interval has passed (or always with force).
+
+        `flush` runs first, so the output is never behind the committed state.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_checkpoint < self.checkpoint_interval:
+            return
+        if flush is not None:
+            flush()
+        self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                            [('saved', str(self.saved)), ('site_counts', json.dumps(self.site_counts))])
+        self.db.commit()
+        self._last_checkpoint = now
+
+    def finish(self, flush=None):
+        """Mark the crawl complete so the next run starts fresh"""
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('finished', '1')")
+        self.checkpoint(force=True, flush=flush)
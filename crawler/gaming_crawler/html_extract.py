@@ -0,0 +1,328 @@
+# Page extraction backends for GamingDeepCrawler
+#
+# Every backend turns raw HTML into the same fields:
+#     {'title', 'description', 'content', 'date', 'links': [(href, text), ...]}
+#
+#   bs4         BeautifulSoup + html.parser. This is the original multi-pass
+#               extraction, with one select() per content/date selector.
+#   lxml        (default) lxml's C parser. A single walk over the tree records
+#               the title, meta description, content-block candidates, date
+#               candidates, paragraphs and links. Only the winning content
+#               blocks are visited a second time, to read their text.
+#   selectolax  The same single walk on selectolax's lexbor parser.
+#               Optional: pip install selectolax
+#
+# Run this file from crawler/ to benchmark the backends on saved pages. By
+# default it reads the committed pages in crawler/fixtures/ (made-up text in
+# common news, review, blog, guide and job-board markup),
+# workwithindies.html, and the bodies in http_cache if there is one:
+#     python -m gaming_crawler.html_extract
+#     python -m gaming_crawler.html_extract --fixtures http_cache
+
+import argparse
+import glob
+import gzip
+import os
+import time
+
+# Checked in this order; the first one that matches anything supplies the content
+CONTENT_SELECTORS = [
+    'article', '.article-content', '.post-content', '.content',
+    '.entry-content', '.article-body', 'main', '.main-content'
+]
+DATE_SELECTORS = [
+    'time[datetime]', '.date', '.published', '.post-date',
+    '.article-date', '[class*="date"]'
+]
+# Removed from content blocks before their text is taken
+STRIP_TAGS = ['script', 'style', 'nav', 'header', 'footer']
+
+_CONTENT_TAGS = {'article': 0, 'main': 6}
+_CONTENT_CLASSES = {'article-content': 1, 'post-content': 2, 'content': 3,
+                    'entry-content': 4, 'article-body': 5, 'main-content': 7}
+CRAWLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FIXTURES = [os.path.join(CRAWLER_DIR, 'fixtures'), os.path.join(CRAWLER_DIR, 'workwithindies.html'),
+                    'http_cache']
+
+_DATE_CLASSES = {'date': 1, 'published': 2, 'post-date': 3, 'article-date': 4}
+
+
+def _assemble(title, description, blocks, paragraphs, dates, links, block_text, text, date_value):
+    """Turn what the walk collected into the fields, with the original precedence rules"""
+    content = ""
+    for candidates in blocks:
+        if candidates:
+            parts = [block_text(node).strip() for node in candidates]
+            content = ' '.join(t for t in parts if t and len(t) > 50)
+            break
+
+    # Fallback to paragraphs
+    if not content or len(content) < 100:
+        para_texts = [text(p).strip() for p in paragraphs]
+        content = ' '.join(t for t in para_texts if t and len(t) > 20)
+
+    date = ""
+    for node in dates:
+        if node is not None:
+            date = date_value(node)
+            if date:
+                break
+
+    return {'title': title, 'description': description, 'content': content,
+            'date': date, 'links': links}
+
+
+def _classify_node(node, tag, attrs, blocks, dates):
+    """File a node under every content / date selector it matches"""
+    rank = _CONTENT_TAGS.get(tag)
+    if rank is not None:
+        blocks[rank].append(node)
+    classes = attrs.get('class') or ''
+    if classes:
+        for name in classes.split():
+            rank = _CONTENT_CLASSES.get(name)
+            if rank is not None:
+                blocks[rank].append(node)
+            rank = _DATE_CLASSES.get(name)
+            if rank is not None and dates[rank] is None:
+                dates[rank] = node
+        if 'date' in classes and dates[5] is None:
+            dates[5] = node
+    if tag == 'time' and dates[0] is None and attrs.get('datetime') is not None:
+        dates[0] = node
+
+
+def extract_lxml(html):
+    import lxml.etree
+    import lxml.html
+
+    try:
+        root = lxml.html.document_fromstring(html)
+    except ValueError:
+        # Unicode strings with an encoding declaration must be parsed as bytes
+        root = lxml.html.document_fromstring(html.encode('utf-8'))
+    except lxml.etree.ParserError:
+        return None
+
+    title = h1 = description = og_description = None
+    blocks = [[] for _ in CONTENT_SELECTORS]
+    dates = [None] * len(DATE_SELECTORS)
+    paragraphs, links = [], []
+    for el in root.iter(tag=lxml.etree.Element):
+        tag = el.tag
+        if tag == 'a':
+            href = el.get('href')
+            if href is not None:
+                links.append((href, el.text_content().strip()))
+        elif tag == 'p':
+            paragraphs.append(el)
+        elif tag == 'title':
+            if title is None:
+                title = el.text_content().strip()
+        elif tag == 'h1':
+            if h1 is None:
+                h1 = el
+        elif tag == 'meta':
+            if description is None and el.get('name') == 'description':
+                description = el.get('content', '')
+            elif og_description is None and el.get('property') == 'og:description':
+                og_description = el.get('content', '')
+        if tag in _CONTENT_TAGS or tag == 'time' or el.get('class'):
+            _classify_node(el, tag, el.attrib, blocks, dates)
+
+    def block_text(el):
+        lxml.etree.strip_elements(el, *STRIP_TAGS, with_tail=False)
+        return el.text_content()
+
+    return _assemble(
+        title or (h1.text_content().strip() if h1 is not None else ""),
+        (description if description is not None else og_description or "").strip(),
+        blocks, paragraphs, dates, links,
+        block_text, lambda el: el.text_content(),
+        lambda el: el.get('datetime') or el.get('content') or el.text_content().strip(),
+    )
+
+
+def extract_selectolax(html):
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    if tree.root is None:
+        return None
+
+    title = h1 = description = og_description = None
+    blocks = [[] for _ in CONTENT_SELECTORS]
+    dates = [None] * len(DATE_SELECTORS)
+    paragraphs, links = [], []
+    for node in tree.root.traverse():
+        tag = node.tag
+        if tag == 'a':
+            attrs = node.attributes
+            if 'href' in attrs:
+                links.append((attrs['href'] or '', node.text(deep=True).strip()))
+        elif tag == 'p':
+            paragraphs.append(node)
+        elif tag == 'title':
+            if title is None:
+                title = node.text(deep=True).strip()
+        elif tag == 'h1':
+            if h1 is None:
+                h1 = node
+        elif tag == 'meta':
+            attrs = node.attributes
+            if description is None and attrs.get('name') == 'description':
+                description = attrs.get('content') or ''
+            elif og_description is None and attrs.get('property') == 'og:description':
+                og_description = attrs.get('content') or ''
+        if tag in _CONTENT_TAGS or tag == 'time' or 'class' in node.attributes:
+            _classify_node(node, tag, node.attributes, blocks, dates)
+
+    def block_text(node):
+        node.strip_tags(STRIP_TAGS, recursive=True)
+        return node.text(deep=True)
+
+    return _assemble(
+        title or (h1.text(deep=True).strip() if h1 is not None else ""),
+        (description if description is not None else og_description or "").strip(),
+        blocks, paragraphs, dates, links,
+        block_text, lambda node: node.text(deep=True),
+        lambda node: (node.attributes.get('datetime') or node.attributes.get('content') or
+                      node.text(deep=True).strip()),
+    )
+
+
+def extract_bs4(html):
+    """The original extraction: html.parser plus one select() per selector"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    title = ""
+    if soup.title and soup.title.string:
+        title = soup.title.string.strip()
+    elif soup.find('h1'):
+        title = soup.find('h1').get_text().strip()
+
+    description = ""
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    if not meta_desc:
+        meta_desc = soup.find('meta', attrs={'property': 'og:description'})
+    if meta_desc:
+        description = meta_desc.get('content', '').strip()
+
+    content = ""
+    for selector in CONTENT_SELECTORS:
+        elements = soup.select(selector)
+        if elements:
+            content_parts = []
+            for elem in elements:
+                for script in elem(STRIP_TAGS):
+                    script.decompose()
+                text = elem.get_text().strip()
+                if text and len(text) > 50:
+                    content_parts.append(text)
+            content = ' '.join(content_parts)
+            break
+
+    if not content or len(content) < 100:
+        para_texts = [p.get_text().strip() for p in soup.find_all('p')]
+        content = ' '.join(t for t in para_texts if t and len(t) > 20)
+
+    date = ""
+    for selector in DATE_SELECTORS:
+        date_elem = soup.select_one(selector)
+        if date_elem:
+            date = (date_elem.get('datetime') or
+                    date_elem.get('content') or
+                    date_elem.get_text().strip())
+            if date:
+                break
+
+    links = [(a['href'], a.get_text().strip()) for a in soup.find_all('a', href=True)]
+    return {'title': title, 'description': description, 'content': content,
+            'date': date, 'links': links}
+
+
+EXTRACTORS = {
+    'bs4': extract_bs4,
+    'lxml': extract_lxml,
+    'selectolax': extract_selectolax,
+}
+
+
+def get_extractor(name):
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown parser {name!r}, expected one of {sorted(EXTRACTORS)}")
+    return EXTRACTORS[name]
+
+
+def load_fixtures(paths):
+    """Read saved pages (.html / .html.gz files, or directories searched recursively)
+
+    Paths that do not exist are reported and skipped.
+    """
+    pages = []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Skipping {path}: not found")
+            continue
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(glob.glob(os.path.join(path, '**', '*.html'), recursive=True) +
+                           glob.glob(os.path.join(path, '**', '*.html.gz'), recursive=True))
+        for file in files:
+            opener = gzip.open if file.endswith('.gz') else open
+            with opener(file, 'rt', encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+    return pages
+
+
+def benchmark(pages, parsers, repeat=3):
+    """pages/sec and CPU ms per page for each parser (best of `repeat` runs)"""
+    results = {}
+    for name in parsers:
+        extract = get_extractor(name)
+        best_wall = best_cpu = float('inf')
+        for _ in range(repeat):
+            wall, cpu = time.perf_counter(), time.process_time()
+            for html in pages:
+                extract(html)
+            best_wall = min(best_wall, time.perf_counter() - wall)
+            best_cpu = min(best_cpu, time.process_time() - cpu)
+        results[name] = (len(pages) / best_wall, 1000 * best_cpu / len(pages))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction backends on saved pages")
+    parser.add_argument('--fixtures', nargs='+', default=DEFAULT_FIXTURES,
+                        help="Saved .html/.html.gz pages or directories of them")
+    parser.add_argument('--parsers', default=None, help="Comma-separated backends (default: all installed)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        raise SystemExit(f"No pages found in {args.fixtures}; crawl first or pass --fixtures")
+    if args.parsers:
+        names = args.parsers.split(',')
+    else:
+        names = ['bs4', 'lxml']
+        try:
+            import selectolax  # noqa: F401
+            names.append('selectolax')
+        except ImportError:
+            pass
+
+    # Pages whose title, description, content and date all match the original
+    # extraction (links can legitimately differ where html.parser repairs
+    # broken markup differently)
+    text_fields = ('title', 'description', 'content', 'date')
+    baseline = [extract_bs4(html) for html in pages]
+    results = benchmark(pages, names, args.repeat)
+    print(f"\n--- {len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.1f} KB average ---")
+    print(f"{'parser':>12}{'pages/sec':>12}{'CPU ms/page':>14}{'speedup':>10}{'same text':>14}")
+    for name, (rate, cpu_ms) in results.items():
+        fields = [get_extractor(name)(html) for html in pages]
+        same = sum(all(f[k] == b[k] for k in text_fields) for f, b in zip(fields, baseline))
+        print(f"{name:>12}{rate:>12.1f}{cpu_ms:>14.2f}{rate / results[names[0]][0]:>10.2f}"
+              f"{f'{same}/{len(pages)}':>14}")
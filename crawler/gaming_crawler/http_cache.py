@@ -0,0 +1,115 @@
+# Pooled HTTP client with an on-disk, revalidating response cache
+#
+# All requests go through one requests.Session whose connection pools keep
+# TCP/TLS connections alive per host. Every 200 response is stored on disk
+# (gzip body + ETag/Last-Modified + whatever the caller derived from it), and
+# the next request for the same URL is sent as a conditional request. A 304
+# answer costs a few hundred bytes and lets the caller reuse the stored
+# result without downloading or parsing the page again.
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CachedResponse:
+    def __init__(self, url, status_code, text, entry, not_modified, headers=None, size=0):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+        self.size = size
+        # Extra data the caller stored with the cached copy (e.g. parsed page)
+        self.entry = entry
+        # True if the server answered 304 and `text` came from the cache
+        self.not_modified = not_modified
+
+
+class CachedHttpClient:
+    def __init__(self, cache_dir='http_cache', pool_connections=32, pool_maxsize=8):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.session = requests.Session()
+        # pool_connections = hosts kept alive, pool_maxsize = connections per host
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.stats = {'requests': 0, 'not_modified': 0, 'bytes_downloaded': 0, 'bytes_saved': 0}
+        self._lock = threading.Lock()
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base + '.json', base + '.html.gz'
+
+    def load(self, url):
+        """Cached metadata for a URL, or None"""
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_body(self, url):
+        _, body_path = self._paths(url)
+        with gzip.open(body_path, 'rt', encoding='utf-8') as f:
+            return f.read()
+
+    def store(self, url, response, entry=None):
+        """Save a fresh 200 response plus caller data so the next request can revalidate"""
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        with gzip.open(body_path, 'wt', encoding='utf-8') as f:
+            f.write(response.text)
+        meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'size': response.size,
+            'entry': entry,
+        }
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    def get(self, url, headers=None, timeout=15):
+        """GET with If-None-Match / If-Modified-Since when we hold a cached copy"""
+        cached = self.load(url)
+        headers = dict(headers or {})
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=timeout)
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['bytes_downloaded'] += len(response.content)
+            if cached and response.status_code == 304:
+                self.stats['not_modified'] += 1
+                self.stats['bytes_saved'] += cached.get('size', 0)
+
+        if cached and response.status_code == 304:
+            # Only read the stored body back if there is no stored result to reuse
+            text = None if cached.get('entry') is not None else self.load_body(url)
+            return CachedResponse(url, 200, text, cached.get('entry'), True, size=cached.get('size', 0))
+        return CachedResponse(url, response.status_code, response.text, None, False,
+                              headers=response.headers, size=len(response.content))
+
+    def connections_opened(self):
+        """New TCP (+TLS) connections made so far, summed over all host pools"""
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in list(pools.keys()))
+
+    def summary(self):
+        opened = self.connections_opened()
+        return dict(self.stats, connections_opened=opened,
+                    handshakes_avoided=max(0, self.stats['requests'] - opened))
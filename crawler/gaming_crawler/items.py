@@ -2,11 +2,32 @@
 #
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
+#
+# Field names match the columns of the consolidated corpus
+# (nlp_pipeline/corpus_stream.py), so every spider emits the same shape:
+# a job or guide title is stored as `title`, not `job_title` / `guide_title`.
 
 import scrapy
 
 
 class GamingCrawlerItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
+    title = scrapy.Field()
+    url = scrapy.Field()
+    summary = scrapy.Field()
+    source = scrapy.Field()
+    date = scrapy.Field()
+
+
+class NewsItem(GamingCrawlerItem):
     pass
+
+
+class GuideItem(GamingCrawlerItem):
+    game_name = scrapy.Field()
+    platform = scrapy.Field()
+    author = scrapy.Field()
+
+
+class JobItem(GamingCrawlerItem):
+    company = scrapy.Field()
+    location = scrapy.Field()
@@ -0,0 +1,161 @@
+# Append-only JSON-lines output shared by the crawlers
+#
+# Items are appended one line at a time to segment files as they are
+# scraped, so saving never re-reads or rewrites earlier output:
+#
+#     output/<name>/part-00001.jsonl
+#     output/<name>/part-00002.jsonl
+#     output/<name>/seen.db          keys already written (64-bit fingerprints)
+#
+# Every run starts a new segment, and a segment is closed once it reaches
+# max_segment_bytes. When enough small segments have built up, compact()
+# merges them into full-size ones. Closed segments are never modified, only
+# replaced whole by compaction. 1_consolidate_data.py reads the segments
+# directly.
+
+import glob
+import json
+import os
+import re
+import sqlite3
+
+from gaming_crawler.frontier import url_fingerprint
+
+OUTPUT_DIR = 'output'
+_SEGMENT_RE = re.compile(r'part-(\d+)\.jsonl$')
+
+
+class JsonlSink:
+    def __init__(self, name, directory=OUTPUT_DIR, key='url', max_segment_bytes=64 << 20,
+                 compact_threshold=16):
+        self.directory = os.path.join(directory, name)
+        self.key = key  # Item field used for deduplication
+        self.max_segment_bytes = max_segment_bytes
+        self.compact_threshold = compact_threshold
+        os.makedirs(self.directory, exist_ok=True)
+
+        index_path = os.path.join(self.directory, 'seen.db')
+        rebuild = not os.path.exists(index_path)
+        self.index = sqlite3.connect(index_path)
+        self.index.execute("CREATE TABLE IF NOT EXISTS seen (fp INTEGER PRIMARY KEY) WITHOUT ROWID")
+        if rebuild:
+            # The index is derived data: recreate it from the segments if it is missing
+            self._index_keys(item.get(self.key) for item in self.iter_items())
+        self.index.commit()
+
+        self.written = 0
+        self.duplicates = 0
+        self._file = None
+        self._next_segment = max(self._segment_numbers(), default=0) + 1
+
+    def _segment_numbers(self):
+        numbers = []
+        for path in glob.glob(os.path.join(self.directory, 'part-*.jsonl')):
+            match = _SEGMENT_RE.search(path)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f'part-{number:05d}.jsonl')
+
+    def segments(self):
+        """Paths of all segments, oldest first"""
+        return [self._segment_path(n) for n in self._segment_numbers()]
+
+    def iter_items(self, paths=None):
+        """Yield every stored item; a torn last line from a crash is skipped"""
+        for path in self.segments() if paths is None else paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+    def _index_keys(self, keys):
+        self.index.executemany("INSERT OR IGNORE INTO seen (fp) VALUES (?)",
+                               ((url_fingerprint(str(k)),) for k in keys if k))
+
+    def _open_segment(self):
+        self._path = self._segment_path(self._next_segment)
+        self._next_segment += 1
+        self._file = open(self._path, 'a', encoding='utf-8')
+
+    def write(self, item):
+        """Append an item unless its key was written before; returns True if written"""
+        value = item.get(self.key)
+        if value:
+            cursor = self.index.execute("INSERT OR IGNORE INTO seen (fp) VALUES (?)",
+                                        (url_fingerprint(str(value)),))
+            if cursor.rowcount == 0:
+                self.duplicates += 1
+                return False
+        if self._file is None:
+            self._open_segment()
+        self._file.write(json.dumps(item, ensure_ascii=False) + '\n')
+        self.written += 1
+        if self._file.tell() >= self.max_segment_bytes:
+            self._close_segment()
+        return True
+
+    def flush(self):
+        """Make everything written so far durable (lines first, then the index)"""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.index.commit()
+
+    def _close_segment(self):
+        self.flush()
+        self._file.close()
+        self._file = None
+        if os.path.getsize(self._path) == 0:
+            os.remove(self._path)
+
+    def close(self):
+        if self._file is not None:
+            self._close_segment()
+        self.index.commit()
+        if len(self._small_segments()) >= self.compact_threshold:
+            self.compact()
+        self.index.close()
+
+    def _small_segments(self):
+        return [p for p in self.segments() if os.path.getsize(p) < self.max_segment_bytes // 2]
+
+    def compact(self):
+        """Merge segments under half the size limit into as few full-size ones as possible.
+
+        Records with a key seen earlier in the merged segments are dropped, as
+        are torn lines. New segments are written under temporary names and
+        renamed into place before the old ones are removed.
+        """
+        if self._file is not None:
+            self._close_segment()
+        old = self._small_segments()
+        if len(old) < 2:
+            return old
+        keys = set()
+        merged, out = [], None
+        for item in self.iter_items(old):
+            value = item.get(self.key)
+            if value:
+                fp = url_fingerprint(str(value))
+                if fp in keys:
+                    continue
+                keys.add(fp)
+            if out is None or out.tell() >= self.max_segment_bytes:
+                if out is not None:
+                    out.close()
+                merged.append(self._segment_path(self._next_segment))
+                self._next_segment += 1
+                out = open(merged[-1] + '.tmp', 'w', encoding='utf-8')
+            out.write(json.dumps(item, ensure_ascii=False) + '\n')
+        if out is not None:
+            out.close()
+        for path in merged:
+            os.replace(path + '.tmp', path)
+        for path in old:
+            os.remove(path)
+        return merged
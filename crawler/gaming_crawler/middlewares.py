@@ -3,7 +3,14 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import queue
+import threading
+
 from scrapy import signals
+from scrapy.http import HtmlResponse
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import threads
+from twisted.internet.defer import DeferredSemaphore
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
@@ -98,3 +105,192 @@ class GamingCrawlerDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class BrowserPool:
+    """A fixed set of headless browsers shared by every spider in the process.
+
+    Browsers start on demand, are reused from request to request, and are
+    replaced if one crashes. render() blocks, so it must run in a thread.
+    """
+
+    _shared = {}
+
+    def __init__(self, kind='chrome', size=2, headless=True):
+        self.kind = kind
+        self.size = size
+        self.headless = headless
+        self.idle = queue.LifoQueue()
+        # Caps pages rendering at once, on the reactor side, so no worker thread
+        # ever sits waiting for a free browser
+        self.limit = DeferredSemaphore(size)
+        self.started = 0
+        self.users = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, kind, size, headless):
+        key = (kind, headless)
+        if key not in cls._shared:
+            cls._shared[key] = cls(kind, size, headless)
+        pool = cls._shared[key]
+        pool.users += 1
+        return pool
+
+    def release_user(self):
+        """Drop one user; the last one to leave shuts the browsers down"""
+        self.users -= 1
+        if self.users <= 0:
+            BrowserPool._shared.pop((self.kind, self.headless), None)
+            self.close()
+
+    def _launch(self):
+        if self.kind == 'undetected':
+            import undetected_chromedriver as uc
+
+            options = uc.ChromeOptions()
+            if self.headless:
+                options.add_argument('--headless=new')
+            return uc.Chrome(options=options)
+
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service as ChromeService
+
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument('--headless')
+        options.add_argument('--log-level=3')
+        # This line prevents the "DevTools listening on..." message
+        options.add_experimental_option('excludeSwitches', ['enable-logging'])
+        return webdriver.Chrome(service=ChromeService(_chromedriver_path()), options=options)
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            launch = self.started < self.size
+            if launch:
+                self.started += 1
+        if not launch:
+            return self.idle.get()
+        try:
+            return self._launch()
+        except Exception:
+            with self._lock:
+                self.started -= 1
+            raise
+
+    def release(self, driver, broken=False):
+        if broken:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            with self._lock:
+                self.started -= 1
+        else:
+            self.idle.put(driver)
+
+    def render(self, request):
+        """Load request.url in a browser and return the rendered page as an HtmlResponse"""
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        meta = request.meta
+        driver = self.acquire()
+        broken = False
+        try:
+            driver.get(request.url)
+            wait = WebDriverWait(driver, meta.get('js_timeout', 20))
+            # Wait until the page is actually ready instead of sleeping a fixed time
+            if meta.get('wait_for'):
+                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, meta['wait_for'])))
+            else:
+                wait.until(lambda d: d.execute_script('return document.readyState') == 'complete')
+            if meta.get('js_click'):
+                # e.g. a cookie banner; fine if it is not there
+                for element in driver.find_elements(By.CSS_SELECTOR, meta['js_click'])[:1]:
+                    element.click()
+            return HtmlResponse(url=driver.current_url, body=driver.page_source,
+                                encoding='utf-8', request=request)
+        except TimeoutException:
+            # Hand back whatever rendered; the spider's selectors decide if it is usable
+            return HtmlResponse(url=driver.current_url, body=driver.page_source,
+                                encoding='utf-8', request=request)
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def close(self):
+        while True:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+_driver_path = None
+
+
+def _chromedriver_path():
+    # webdriver_manager checks for updates on every install() call; do it once per process
+    global _driver_path
+    if _driver_path is None:
+        from webdriver_manager.chrome import ChromeDriverManager
+        _driver_path = ChromeDriverManager().install()
+    return _driver_path
+
+
+class BrowserPoolMiddleware:
+    """Renders requests marked with meta {'js': True} in a pooled browser.
+
+    Other meta keys:
+        browser      'chrome' (default) or 'undetected' (undetected_chromedriver)
+        wait_for     CSS selector that must be present before the page is read
+        js_timeout   seconds to wait for it (default 20)
+        js_click     CSS selector to click once loaded, if present
+
+    Rendering runs on Twisted's thread pool, at most BROWSER_POOL_SIZE pages
+    at a time per browser kind (shared by all spiders in the process), so the
+    reactor keeps downloading other requests meanwhile. Requests without `js` are left to the normal downloader.
+    """
+
+    def __init__(self, settings):
+        self.size = settings.getint('BROWSER_POOL_SIZE', 2)
+        self.headless = {
+            'chrome': settings.getbool('BROWSER_HEADLESS', True),
+            'undetected': settings.getbool('BROWSER_UNDETECTED_HEADLESS', False),
+        }
+        self.pools = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        s = cls(crawler.settings)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _pool(self, kind):
+        if kind not in self.pools:
+            self.pools[kind] = BrowserPool.shared(kind, self.size, self.headless[kind])
+        return self.pools[kind]
+
+    async def process_request(self, request, spider):
+        if not request.meta.get('js'):
+            return None
+        pool = self._pool(request.meta.get('browser', 'chrome'))
+        return await maybe_deferred_to_future(pool.limit.run(threads.deferToThread, pool.render, request))
+
+    def spider_closed(self, spider):
+        for pool in self.pools.values():
+            pool.release_user()
+        self.pools.clear()
@@ -2,12 +2,78 @@
 #
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+#
+# GamingCrawlerPipeline cleans every item the spiders yield and appends it to
+# output/<spider name>/ through a JsonlSink. It trims whitespace, turns empty
+# values into None and canonicalizes the URL. Items without a title or URL,
+# and URLs stored by any earlier run, are dropped. The rows already have the
+# corpus column names, so 1_consolidate_data.py only has to merge them.
 
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy.exceptions import DropItem
+
+from gaming_crawler.jsonl_sink import OUTPUT_DIR, JsonlSink
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|fbclid|gclid|dclid|mc_cid|mc_eid|_ga)$', re.IGNORECASE)
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url):
+    """One spelling per page: lowercase scheme and host, no default port,
+    fragment or tracking parameters"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if parts.port is not None and parts.port == _DEFAULT_PORTS.get(scheme):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not TRACKING_PARAMS.match(k)]
+    return urlunsplit((scheme, netloc, parts.path or '/', urlencode(query), ''))
+
+
+def clean_text(value):
+    if value is None:
+        return None
+    value = ' '.join(str(value).split())
+    return value or None
 
 
 class GamingCrawlerPipeline:
+    def __init__(self, output_dir=OUTPUT_DIR, flush_every=500):
+        self.output_dir = output_dir
+        self.flush_every = flush_every
+        self.sink = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get('CORPUS_OUTPUT_DIR', OUTPUT_DIR),
+                   crawler.settings.getint('CORPUS_FLUSH_EVERY', 500))
+
+    def open_spider(self, spider):
+        self.sink = JsonlSink(spider.name, self.output_dir)
+
+    def close_spider(self, spider):
+        self.sink.close()
+        spider.logger.info(f"Saved {self.sink.written} new items to {self.sink.directory} "
+                           f"({self.sink.duplicates} duplicates dropped)")
+
     def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        for field in adapter.field_names():
+            adapter[field] = clean_text(adapter.get(field))
+        if not adapter.get('title'):
+            raise DropItem(f"Missing title in {adapter.get('url')}")
+        if not adapter.get('url'):
+            raise DropItem(f"Missing url for {adapter['title']!r}")
+        adapter['url'] = canonicalize_url(adapter['url'])
+
+        if not self.sink.write(adapter.asdict()):
+            raise DropItem(f"Duplicate url {adapter['url']}")
+        if self.sink.written % self.flush_every == 0:
+            self.sink.flush()
         return item
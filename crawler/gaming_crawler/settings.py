@@ -46,9 +46,17 @@ DOWNLOAD_DELAY = 1
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
+DOWNLOADER_MIDDLEWARES = {
 #    "gaming_crawler.middlewares.GamingCrawlerDownloaderMiddleware": 543,
-#}
+    # Renders requests with meta {"js": True} in a shared pool of headless browsers
+    "gaming_crawler.middlewares.BrowserPoolMiddleware": 950,
+}
+
+# Browsers kept open for JS pages (per browser kind, shared by all spiders in a process)
+BROWSER_POOL_SIZE = 2
+BROWSER_HEADLESS = True
+# The undetected_chromedriver spiders ran with a visible window; keep that default
+BROWSER_UNDETECTED_HEADLESS = False
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -58,9 +66,12 @@ DOWNLOAD_DELAY = 1
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "gaming_crawler.pipelines.GamingCrawlerPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "gaming_crawler.pipelines.GamingCrawlerPipeline": 300,
+}
+
+# Cleaned, deduplicated items are appended to <CORPUS_OUTPUT_DIR>/<spider name>/
+CORPUS_OUTPUT_DIR = "output"
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
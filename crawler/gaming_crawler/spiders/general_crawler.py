@@ -1,24 +1,46 @@
-import json
 import time
 import re
 import os
+import sys
 from urllib.parse import urlparse, urljoin, urlunparse
-from collections import deque
-import requests
-from bs4 import BeautifulSoup
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 import logging
 
+# Allow running this file directly (python gaming_crawler/spiders/general_crawler.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from gaming_crawler.frontier import Frontier, SqliteFrontier
+from gaming_crawler.html_extract import get_extractor
+from gaming_crawler.http_cache import CachedHttpClient
+from gaming_crawler.jsonl_sink import JsonlSink
+
+
 class GamingDeepCrawler:
-    def __init__(self, base_urls, max_depth=2, delay=2, max_pages=200, pages_per_site=30):
+    def __init__(self, base_urls, max_depth=2, delay=2, max_pages=200, pages_per_site=30,
+                 max_workers=8, per_domain_concurrency=1, cache_dir='http_cache',
+                 state_path='crawl_state.db', checkpoint_interval=10.0, output_name='gaming_content_crawl',
+                 parser='lxml'):
         self.base_urls = base_urls
         self.max_depth = max_depth
         self.visited = set()
-        self.data = []
-        self.delay = delay
+        self.delay = delay  # Politeness delay between requests to the same domain
         self.max_pages = max_pages
         self.pages_per_site = pages_per_site
-        self.site_data_counts = {}
+        self.max_workers = max_workers  # Requests in flight across all domains
+        self.per_domain_concurrency = per_domain_concurrency
+        # Queue, seen URLs and per-site counts live on disk and are checkpointed every
+        # `checkpoint_interval` seconds, so an interrupted crawl resumes where it
+        # stopped. state_path=None keeps everything in memory instead.
+        self.frontier = SqliteFrontier(state_path, checkpoint_interval) if state_path else Frontier()
+        # Saved pages are appended to output/<output_name>/ as they are scraped
+        self.sink = JsonlSink(output_name)
+        # HTML extraction backend: 'lxml' (default), 'selectolax' or the original 'bs4'
+        self.extract = get_extractor(parser)
+        # Keep-alive connection pools plus an on-disk cache for conditional re-crawls
+        self.http = CachedHttpClient(cache_dir, pool_connections=max(32, len(base_urls)),
+                                     pool_maxsize=per_domain_concurrency)
+        self.site_data_counts = self.frontier.site_counts
         self.gaming_keywords = [
             'game', 'gaming', 'gamer', 'review', 'preview', 'trailer',
             'gameplay', 'developer', 'publisher', 'console', 'pc',
@@ -78,80 +100,23 @@ class GamingDeepCrawler:
         except Exception:
             return None
     
-    def extract_metadata(self, soup, url):
-        """Extract metadata in format compatible with existing crawlers"""
+    def extract_metadata(self, fields, url):
+        """Build a page record, in the format of the other crawlers, from extracted fields"""
         try:
-            # Title extraction
-            title = ""
-            if soup.title and soup.title.string:
-                title = soup.title.string.strip()
-            elif soup.find('h1'):
-                title = soup.find('h1').get_text().strip()
-            
-            # Meta description for summary
-            summary = ""
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            if not meta_desc:
-                meta_desc = soup.find('meta', attrs={'property': 'og:description'})
-            if meta_desc:
-                summary = meta_desc.get('content', '').strip()
-            
-            # Main content extraction
-            content_selectors = [
-                'article', '.article-content', '.post-content', '.content',
-                '.entry-content', '.article-body', 'main', '.main-content'
-            ]
-            
-            content = ""
-            for selector in content_selectors:
-                elements = soup.select(selector)
-                if elements:
-                    content_parts = []
-                    for elem in elements:
-                        for script in elem(["script", "style", "nav", "header", "footer"]):
-                            script.decompose()
-                        text = elem.get_text().strip()
-                        if text and len(text) > 50:
-                            content_parts.append(text)
-                    content = ' '.join(content_parts)
-                    break
-            
-            # Fallback to paragraphs
-            if not content or len(content) < 100:
-                paragraphs = soup.find_all('p')
-                para_texts = []
-                for p in paragraphs:
-                    text = p.get_text().strip()
-                    if text and len(text) > 20:
-                        para_texts.append(text)
-                content = ' '.join(para_texts)
-            
-            # Extract date
-            date = ""
-            date_selectors = [
-                'time[datetime]', '.date', '.published', '.post-date',
-                '.article-date', '[class*="date"]'
-            ]
-            for selector in date_selectors:
-                date_elem = soup.select_one(selector)
-                if date_elem:
-                    date = (date_elem.get('datetime') or 
-                           date_elem.get('content') or 
-                           date_elem.get_text().strip())
-                    if date:
-                        break
-            
+            summary = fields['description']
+            content = fields['content']
+
             # Get source domain
             source_domain = urlparse(url).netloc
             source_name = source_domain.replace('www.', '').replace('.com', '').title()
             
             # Return in compatible format (flat structure like other crawlers)
             return {
-                'title': title,
+                'title': fields['title'],
                 'summary': summary[:500] if summary else content[:200] + "..." if content else "",
                 'content': content[:2000],  # Limit for processing
                 'url': url,
-                'date': date,
+                'date': fields['date'],
                 'source': source_name
             }
             
@@ -159,13 +124,12 @@ class GamingDeepCrawler:
             self.logger.error(f"Error extracting metadata from {url}: {str(e)}")
             return None
     
-    def find_links(self, soup, base_url):
-        """Extract and filter relevant links"""
+    def find_links(self, page_links, base_url):
+        """Filter the page's (href, text) links down to relevant same-site URLs"""
         links = []
         base_domain = urlparse(base_url).netloc
         
-        for link in soup.find_all('a', href=True):
-            href = link['href']
+        for href, text in page_links:
             normalized = self.normalize_url(href, base_url)
             
             if not normalized or normalized in self.visited:
@@ -175,7 +139,7 @@ class GamingDeepCrawler:
             
             # Prioritize same-domain links
             if parsed_link.netloc == base_domain:
-                link_text = link.get_text().strip().lower()
+                link_text = text.lower()
                 
                 if self.is_gaming_related(link_text) or self.is_gaming_related(href):
                     links.insert(0, normalized)
@@ -184,22 +148,13 @@ class GamingDeepCrawler:
         
         return links[:10]  # Limit links per page
     
-    def crawl_page(self, url, depth):
-        """Crawl a single page with site limits"""
-        site_domain = urlparse(url).netloc
-        current_site_count = self.site_data_counts.get(site_domain, 0)
-        
-        if (depth > self.max_depth or 
-            url in self.visited or 
-            not self.is_valid_url(url) or 
-            len(self.data) >= self.max_pages or
-            current_site_count >= self.pages_per_site):
-            return
-        
+    def fetch_page(self, url, depth):
+        """Download and parse one page; runs on a worker thread.
+
+        Returns (page_data, links) or None if the page could not be fetched.
+        """
         try:
             self.logger.info(f"Crawling: {url} (depth: {depth})")
-            time.sleep(self.delay)
-            
             headers = {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
                 "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
@@ -207,145 +162,216 @@ class GamingDeepCrawler:
                 "Connection": "keep-alive",
             }
             
-            response = requests.get(url, headers=headers, timeout=15)
+            response = self.http.get(url, headers=headers, timeout=15)
             if response.status_code != 200:
-                return
-            
-            self.visited.add(url)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract page data
-            page_data = self.extract_metadata(soup, url)
-            
-            if not page_data:
-                return
-            
-            # Check content quality
-            content_check = (page_data.get('title', '') + ' ' + 
-                           page_data.get('content', '')).strip()
-            
-            # Save if gaming-related and substantial
-            if (self.is_gaming_related(content_check) and len(content_check) > 100):
-                self.data.append(page_data)
-                self.site_data_counts[site_domain] = current_site_count + 1
-                self.logger.info(f"✓ Saved from {site_domain} ({self.site_data_counts[site_domain]} pages)")
-            
-            # Crawl deeper if within limits
-            if depth < self.max_depth:
-                links = self.find_links(soup, url)
-                for link in links:
-                    if len(self.data) < self.max_pages:
-                        self.crawl_page(link, depth + 1)
+                return None
+
+            if response.not_modified and response.entry is not None:
+                # Unchanged since the last crawl: reuse what we parsed then
+                page_data, links = response.entry['page_data'], response.entry['links']
+            else:
+                # Title, description, content, date and links in one parse
+                fields = self.extract(response.text)
+                if fields is None:
+                    return None
+
+                # Extract page data
+                page_data = self.extract_metadata(fields, url)
+                links = self.find_links(fields['links'], url)
+                if not response.not_modified:
+                    self.http.store(url, response, {'page_data': page_data, 'links': links})
+
+            return page_data, links if depth < self.max_depth else []
         
         except Exception as e:
             self.logger.error(f"Error crawling {url}: {str(e)}")
-    
-    def start_crawl(self):
-        """Start balanced crawling"""
+            return None
+
+    def site_is_full(self, domain):
+        return (self.site_data_counts.get(domain, 0) >= self.pages_per_site or
+                self.frontier.saved >= self.max_pages)
+
+    def handle_page(self, url, depth, result):
+        """Record a fetched page and queue its links; runs on the main thread"""
+        self.frontier.done(url)
+        self.frontier.checkpoint(flush=self.sink.flush)
+        if result is None:
+            return
+        page_data, links = result
+        site_domain = urlparse(url).netloc
+        self.visited.add(url)
+
+        # Check content quality
+        if page_data and not self.site_is_full(site_domain):
+            content_check = (page_data.get('title', '') + ' ' + 
+                           page_data.get('content', '')).strip()
+            
+            # Save if gaming-related and substantial. Pages saved by an earlier run
+            # count towards the limits too; the sink only skips writing them again.
+            if self.is_gaming_related(content_check) and len(content_check) > 100:
+                self.frontier.saved += 1
+                self.site_data_counts[site_domain] = self.site_data_counts.get(site_domain, 0) + 1
+                if self.sink.write(page_data):
+                    self.logger.info(f"✓ Saved from {site_domain} ({self.site_data_counts[site_domain]} pages)")
+                else:
+                    self.logger.info(f"✓ Already saved from {site_domain} ({self.site_data_counts[site_domain]} pages)")
+
+        # Crawl deeper if within limits
+        if depth < self.max_depth:
+            for link in links:
+                self.frontier.push(link, depth + 1)
+
+    def start_crawl(self, stop=None):
+        """Start balanced crawling.
+
+        Sites are crawled concurrently: a pool of worker threads fetches
+        pages, at most `per_domain_concurrency` at a time and one every
+        `delay` seconds per domain, so total time scales with the busiest
+        site rather than the sum of all politeness delays.
+
+        `stop` is an optional threading.Event. Once it is set, no new pages
+        are fetched; the ones in flight are recorded and the crawl returns,
+        with its progress checkpointed so it can resume.
+        """
+        # Sleeps end early when a stop is requested
+        pause = stop.wait if stop is not None else time.sleep
         self.logger.info("Starting balanced gaming crawl...")
         start_time = time.time()
-        
-        for i, url in enumerate(self.base_urls):
-            site_domain = urlparse(url).netloc
-            self.logger.info(f"Site {i+1}/{len(self.base_urls)}: {site_domain}")
-            
-            initial_count = len(self.data)
-            self.crawl_page(url, 0)
-            
-            pages_added = len(self.data) - initial_count
-            self.logger.info(f"Added {pages_added} pages from {site_domain}")
-            
-            if len(self.data) >= self.max_pages:
-                break
-        
-        end_time = time.time()
-        self.logger.info(f"Crawl completed: {len(self.data)} pages in {end_time - start_time:.1f}s")
-    
-    def save_to_json(self, filepath, append_mode=True):
-        """Save data in format compatible with existing crawlers"""
+
+        if self.frontier.resumed:
+            self.logger.info(f"Resuming crawl: {self.frontier.saved} pages already saved")
+        for url in self.base_urls:
+            self.frontier.push(url, 0)
+
+        next_allowed = defaultdict(float)  # domain -> earliest time for its next request
+        active = defaultdict(int)  # domain -> requests in flight
+        in_flight = {}  # future -> (url, depth, domain)
+
         try:
-            existing_data = []
-            
-            # Load existing data if appending
-            if append_mode and os.path.exists(filepath):
-                self.logger.info(f"Loading existing data from {filepath}")
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:
-                        # Handle both array format and line-by-line JSON
-                        if content.startswith('['):
-                            existing_data = json.loads(content)
-                        else:
-                            # Line-by-line JSON format
-                            for line in content.split('\n'):
-                                if line.strip():
-                                    try:
-                                        existing_data.append(json.loads(line))
-                                    except json.JSONDecodeError:
-                                        continue
-            
-            # Get existing URLs to avoid duplicates
-            existing_urls = {item.get('url') for item in existing_data if item.get('url')}
-            
-            # Filter new data to avoid duplicates
-            new_data = [item for item in self.data if item.get('url') not in existing_urls]
-            
-            # Combine data
-            all_data = existing_data + new_data
-            
-            # Save in array format (compatible with pandas)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(all_data, f, indent=2, ensure_ascii=False)
-            
-            self.logger.info(f"✓ Saved {len(new_data)} new items to {filepath}")
-            self.logger.info(f"✓ Total items in file: {len(all_data)}")
-            return filepath
-            
-        except Exception as e:
-            self.logger.error(f"Error saving JSON: {str(e)}")
-            # Fallback: save only new data
-            try:
-                backup_file = f"backup_{filepath}"
-                with open(backup_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.data, f, indent=2, ensure_ascii=False)
-                self.logger.info(f"Saved to backup file: {backup_file}")
-                return backup_file
-            except:
-                return None
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='crawl') as pool:
+                while True:
+                    if stop is not None and stop.is_set():
+                        self.logger.info(f"Stop requested, finishing {len(in_flight)} requests in flight...")
+                        break
+                    now = time.monotonic()
+                    for domain in self.frontier.domains():
+                        if self.site_is_full(domain):
+                            self.frontier.drop(domain)
+                            continue
+                        while (len(in_flight) < self.max_workers and
+                               active[domain] < self.per_domain_concurrency and
+                               next_allowed[domain] <= now):
+                            item = self.frontier.pop(domain)
+                            if item is None:
+                                break
+                            url, depth = item
+                            if depth > self.max_depth or url in self.visited or not self.is_valid_url(url):
+                                self.frontier.done(url)
+                                continue
+                            next_allowed[domain] = now + self.delay
+                            active[domain] += 1
+                            in_flight[pool.submit(self.fetch_page, url, depth)] = (url, depth, domain)
 
-# Usage
-if __name__ == "__main__":
-    gaming_urls = [
-        "https://www.ign.com/",
-        "https://www.pcgamer.com/",
-        "https://www.gamespot.com/",
-        "https://www.polygon.com/",
-        "https://kotaku.com/",
-        "https://www.rockpapershotgun.com/",
-        "https://www.destructoid.com/",
-        "https://www.eurogamer.net/"
-    ]
+                    if not in_flight:
+                        pending = self.frontier.domains()
+                        if not pending or self.frontier.saved >= self.max_pages:
+                            break
+                        # Everything queued is waiting on a politeness delay
+                        pause(max(0.0, min(next_allowed[d] for d in pending) - time.monotonic()))
+                        continue
+
+                    # Wake up for a finished page or when the next domain may be hit again
+                    waiting = [next_allowed[d] for d in self.frontier.domains() if active[d] < self.per_domain_concurrency]
+                    if waiting and len(in_flight) < self.max_workers:
+                        timeout = max(0.0, min(waiting) - time.monotonic())
+                    else:
+                        timeout = None
+                    if stop is not None:
+                        # Check for a stop request at least once a second
+                        timeout = 1.0 if timeout is None else min(timeout, 1.0)
+                    done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url, depth, domain = in_flight.pop(future)
+                        active[domain] -= 1
+                        self.handle_page(url, depth, future.result())
+            # Stopped early: the pool has waited for the last requests, keep their pages
+            for future, (url, depth, domain) in in_flight.items():
+                self.handle_page(url, depth, future.result())
+        finally:
+            # On Ctrl+C or a crash the last checkpoint is written before exiting
+            self.frontier.checkpoint(force=True, flush=self.sink.flush)
+
+        for site_domain, count in self.site_data_counts.items():
+            self.logger.info(f"Added {count} pages from {site_domain}")
+
+        end_time = time.time()
+        self.logger.info(f"Crawl completed: {self.frontier.saved} pages in {end_time - start_time:.1f}s")
+        http = self.http.summary()
+        self.logger.info(
+            f"HTTP: {http['requests']} requests, {http['not_modified']} not modified, "
+            f"{http['bytes_downloaded']} bytes downloaded, {http['bytes_saved']} bytes saved by revalidation, "
+            f"{http['handshakes_avoided']} handshakes avoided by keep-alive"
+        )
     
+    def close(self, finished=True):
+        """Flush the output and mark the crawl finished; returns the output directory
+
+        With finished=False the state is only checkpointed, so the next run resumes.
+        """
+        if finished:
+            self.frontier.finish(flush=self.sink.flush)
+        else:
+            self.frontier.checkpoint(force=True, flush=self.sink.flush)
+        self.sink.close()
+        self.logger.info(f"✓ Saved {self.sink.written} new items to {self.sink.directory} "
+                         f"({self.sink.duplicates} already saved by earlier runs)")
+        return self.sink.directory
+
+GAMING_URLS = [
+    "https://www.ign.com/",
+    "https://www.pcgamer.com/",
+    "https://www.gamespot.com/",
+    "https://www.polygon.com/",
+    "https://kotaku.com/",
+    "https://www.rockpapershotgun.com/",
+    "https://www.destructoid.com/",
+    "https://www.eurogamer.net/"
+]
+
+
+def main(stop=None):
+    """Run the deep crawl over GAMING_URLS; returns the number of new pages saved
+
+    Setting the `stop` event (a threading.Event) ends the crawl early, resumable like Ctrl+C.
+    """
     crawler = GamingDeepCrawler(
-        base_urls=gaming_urls,
+        base_urls=GAMING_URLS,
         max_depth=2,
         delay=2,
         max_pages=160,     # Total across all sites
-        pages_per_site=20  # Per site limit for balance
+        pages_per_site=20, # Per site limit for balance
+        max_workers=8      # Sites are crawled concurrently
     )
     
-    crawler.start_crawl()
-    
-    # Save in compatible format
-    output_file = crawler.save_to_json('gaming_content_crawl.json', append_mode=True)
+    # Re-running after a crash or Ctrl+C resumes the unfinished crawl from crawl_state.db
+    crawler.start_crawl(stop)
     
-    if output_file:
-        print(f"\n✅ Crawling Complete!")
-        print(f"📄 Total pages: {len(crawler.data)}")
-        print(f"💾 Saved to: {output_file}")
-        print(f"🌐 Sites crawled: {len(crawler.site_data_counts)}")
-        
-        for site, count in crawler.site_data_counts.items():
-            print(f"   {site}: {count} pages")
-    else:
-        print("❌ Failed to save data")
+    stopped = stop is not None and stop.is_set()
+    output_dir = crawler.close(finished=not stopped)
+    if stopped:
+        print(f"\n⏸ Crawl stopped after {crawler.frontier.saved} pages; run it again to resume.")
+        return crawler.sink.written
+
+    print(f"\n✅ Crawling Complete!")
+    print(f"📄 Total pages: {crawler.frontier.saved}")
+    print(f"💾 Saved to: {output_dir}")
+    print(f"🌐 Sites crawled: {len(crawler.site_data_counts)}")
+
+    for site, count in crawler.site_data_counts.items():
+        print(f"   {site}: {count} pages")
+    return crawler.sink.written
+
+
+# Usage
+if __name__ == "__main__":
+    main()
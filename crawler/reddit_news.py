@@ -1,52 +1,183 @@
+import argparse
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import praw
-import json
 from dotenv import load_dotenv
 
-load_dotenv()
-print("Authenticating with Reddit...")
-reddit = praw.Reddit(
-    client_id=os.getenv("REDDIT_CLIENT_ID"),
-    client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
-    user_agent=os.getenv("REDDIT_USER_AGENT"),
-)
-print("Authentication successful.")
-
-subreddit_list = ["gamingnews", "Games", "pcgaming", "gaming", "PS5", "XboxSeriesX", "nintendo"]
-new_posts = [] # This will hold the posts from this run
-post_limit_per_subreddit = 25
-
-print(f"Starting to fetch posts from {len(subreddit_list)} subreddits...")
-for sub_name in subreddit_list:
-    try:
-        print(f"Fetching top {post_limit_per_subreddit} posts from r/{sub_name}...")
-        subreddit = reddit.subreddit(sub_name)
-        for post in subreddit.hot(limit=post_limit_per_subreddit):
-            new_posts.append({
-                "title": post.title, "url": post.url, "score": post.score,
-                "id": post.id, "subreddit": sub_name, "created_utc": post.created_utc,
-                "num_comments": post.num_comments, "source": "Reddit"
-            })
-    except Exception as e:
-        print(f"Could not fetch posts from r/{sub_name}. Error: {e}")
-
-print("\nFinished fetching posts.")
-
-# --- APPEND LOGIC ---
-output_filename = 'reddit_data.json'
-existing_posts = []
-if os.path.exists(output_filename):
+from gaming_crawler.jsonl_sink import OUTPUT_DIR, JsonlSink
+
+SUBREDDITS = ["gamingnews", "Games", "pcgaming", "gaming", "PS5", "XboxSeriesX", "nintendo"]
+# Newest post stored per subreddit, so the next run only asks for newer ones
+WATERMARK_FILE = 'watermarks.json'
+
+
+def make_reddit(**overrides):
+    load_dotenv()
+    return praw.Reddit(
+        client_id=os.getenv("REDDIT_CLIENT_ID"),
+        client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+        user_agent=os.getenv("REDDIT_USER_AGENT"),
+        **overrides,
+    )
+
+
+class RateBudget:
+    """Shared view of Reddit's per-client request budget across worker threads.
+
+    Every worker has its own PRAW instance (PRAW is not thread-safe), and each
+    one only paces itself. They all draw on one budget, so before starting a
+    subreddit a worker waits for the window to reset if too few requests are left.
+    """
+
+    def __init__(self, reserve):
+        self.reserve = reserve
+        self.remaining = None
+        self.reset_at = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, limits):
+        if limits.get('remaining') is None:
+            return
+        with self._lock:
+            self.remaining = limits['remaining']
+            self.reset_at = limits.get('reset_timestamp') or 0.0
+
+    def wait(self):
+        with self._lock:
+            low = self.remaining is not None and self.remaining < self.reserve
+            delay = self.reset_at - time.time() if low else 0.0
+        if delay > 0:
+            print(f"Reddit rate limit nearly used up, waiting {delay:.0f}s for it to reset...")
+            time.sleep(delay)
+
+
+def post_record(post, sub_name):
+    return {
+        "title": post.title, "url": post.url, "score": post.score,
+        "id": post.id, "subreddit": sub_name, "created_utc": post.created_utc,
+        "num_comments": post.num_comments, "source": "Reddit"
+    }
+
+
+def fetch_subreddit(reddit, sub_name, listing, limit, watermark, page_size=25):
+    """Posts of one subreddit, newest first.
+
+    With the `new` listing and a watermark, `new` is read in pages of
+    `page_size` and paging stops at the watermark post itself or the first
+    post older than it, so a quiet subreddit costs one small request. Posts
+    from the watermark's own second are kept (the id dedup drops the ones
+    already saved), so a different post with the same timestamp is not lost.
+    """
+    subreddit = reddit.subreddit(sub_name)
+    posts = []
+    if listing == 'new' and watermark:
+        after = None
+        while len(posts) < limit:
+            page = list(subreddit.new(limit=page_size, params={'after': after} if after else None))
+            for post in page:
+                if post.id == watermark['id'] or post.created_utc < watermark['created_utc']:
+                    return posts
+                posts.append(post_record(post, sub_name))
+                if len(posts) >= limit:
+                    return posts
+            if len(page) < page_size:
+                break
+            after = page[-1].fullname
+    else:
+        source = subreddit.new if listing == 'new' else subreddit.hot
+        posts = [post_record(post, sub_name) for post in source(limit=limit)]
+    return posts
+
+
+def load_watermarks(path):
     try:
-        with open(output_filename, 'r', encoding='utf-8') as f:
-            existing_posts = json.load(f)
-    except json.JSONDecodeError:
-        print(f"Warning: Could not read {output_filename}. A new file will be created.")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_watermarks(path, watermarks):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main(subreddits=SUBREDDITS, listing='new', limit=25, max_new=500, workers=4,
+         output_dir=OUTPUT_DIR, reddit_factory=make_reddit, stop=None):
+    """Fetch every subreddit and append the new posts; returns the number of new posts.
+
+    The first run of a subreddit takes `limit` posts. After that, the `new`
+    listing resumes from the stored watermark and takes up to `max_new` newer
+    posts. The `hot` listing re-reads the top `limit` posts every time and
+    relies on the id dedup alone. Once the optional `stop` event is set,
+    subreddits not started yet are skipped.
+    """
+    # Posts are appended to output/reddit_data/ as they are fetched
+    sink = JsonlSink('reddit_data', output_dir, key='id')
+    watermark_path = os.path.join(sink.directory, WATERMARK_FILE)
+    watermarks = load_watermarks(watermark_path)
+    budget = RateBudget(reserve=workers)
+    local = threading.local()
+
+    def fetch(sub_name):
+        if stop is not None and stop.is_set():
+            return None
+        if not hasattr(local, 'reddit'):
+            local.reddit = reddit_factory()
+        budget.wait()
+        watermark = watermarks.get(sub_name) if listing == 'new' else None
+        posts = fetch_subreddit(local.reddit, sub_name, listing,
+                                max_new if watermark else limit, watermark)
+        budget.update(local.reddit.auth.limits)
+        return posts
+
+    print(f"Starting to fetch {listing} posts from {len(subreddits)} subreddits with {workers} workers...")
+    start = time.perf_counter()
+    fetched = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(fetch, sub_name): sub_name for sub_name in subreddits}
+        # Results are written from this thread only; the sink is not thread-safe
+        for future in as_completed(futures):
+            sub_name = futures[future]
+            try:
+                posts = future.result()
+            except Exception as e:
+                print(f"Could not fetch posts from r/{sub_name}. Error: {e}")
+                continue
+            if posts is None:
+                print(f"r/{sub_name}: skipped, stop requested")
+                continue
+            fetched += len(posts)
+            new = sum(sink.write(post) for post in posts)
+            print(f"r/{sub_name}: {len(posts)} posts fetched, {new} new")
+            if posts:
+                newest = max(posts, key=lambda p: p['created_utc'])
+                current = watermarks.get(sub_name)
+                if current is None or newest['created_utc'] > current['created_utc']:
+                    watermarks[sub_name] = {'created_utc': newest['created_utc'], 'id': newest['id']}
 
-# Combine the old data with the new data
-combined_posts = existing_posts + new_posts
+    # Posts first, then the watermark, so a crash never skips unsaved posts
+    sink.close()
+    save_watermarks(watermark_path, watermarks)
+    elapsed = time.perf_counter() - start
+    print(f"\nFinished fetching posts in {elapsed:.1f}s.")
+    print(f"Saved {sink.written} new posts to {sink.directory} "
+          f"({fetched} fetched, {sink.duplicates} already saved).")
+    return sink.written
 
-print(f"Saving {len(combined_posts)} total posts to {output_filename}...")
-with open(output_filename, 'w', encoding='utf-8') as f:
-    json.dump(combined_posts, f, ensure_ascii=False, indent=4)
 
-print(f"Successfully saved data to {output_filename}.")
\ No newline at end of file
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fetch gaming subreddits into output/reddit_data/")
+    parser.add_argument('--listing', choices=['new', 'hot'], default='new',
+                        help="'new' only fetches posts since the last run; 'hot' re-reads the top posts")
+    parser.add_argument('--limit', type=int, default=25, help="Posts per subreddit on a first or 'hot' run")
+    parser.add_argument('--max-new', type=int, default=500, help="Cap on new posts per subreddit per run")
+    parser.add_argument('--workers', type=int, default=4, help="Subreddits fetched in parallel")
+    args = parser.parse_args()
+    main(listing=args.listing, limit=args.limit, max_new=args.max_new, workers=args.workers)
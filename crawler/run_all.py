@@ -0,0 +1,202 @@
+# Refresh every data source in one process
+#
+# The Scrapy spiders share one CrawlerProcess (one reactor, one browser pool).
+# The deep crawler and the Reddit fetch run in threads beside them, so a full
+# refresh takes about as long as the slowest source instead of the sum of
+# all of them. A per-source table of timings and item counts is printed at
+# the end and saved to logs/last_crawl_summary.json. Ctrl+C stops Scrapy
+# gracefully and tells the threads to stop too; the deep crawl checkpoints
+# and resumes from crawl_state.db on the next run.
+#
+#     python run_all.py                      # everything
+#     python run_all.py --spiders ign_news --skip-deep
+#     python run_all.py --index              # then consolidate + incremental index
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+CRAWLER_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_DIR = os.path.join(CRAWLER_DIR, '..', 'nlp_pipeline')
+
+
+class SourceRun:
+    def __init__(self, name):
+        self.name = name
+        self.started = self.finished = None
+        self.items = 0
+        self.error = None
+
+    @property
+    def seconds(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def as_dict(self):
+        return {'seconds': round(self.seconds, 1), 'items': self.items, 'error': self.error}
+
+
+def run_in_thread(run, target):
+    """Run a blocking source (returns its new item count) on its own thread"""
+    def work():
+        run.started = time.perf_counter()
+        try:
+            run.items = target() or 0
+        except BaseException as e:
+            run.error = f"{type(e).__name__}: {e}"
+        finally:
+            run.finished = time.perf_counter()
+
+    thread = threading.Thread(target=work, name=run.name)
+    thread.start()
+    return thread
+
+
+def wait_for(threads):
+    """Block until the threads finish.
+
+    Polls instead of calling Thread.join(): a Ctrl+C that lands inside join()
+    can leave the thread looking finished while it is still running.
+    """
+    while any(thread.is_alive() for thread in threads):
+        time.sleep(0.2)
+
+
+def run_spiders(names, runs, stop):
+    """Run Scrapy spiders together in one CrawlerProcess; blocks until all finish
+
+    Scrapy handles Ctrl+C itself and closes its spiders with reason 'shutdown';
+    `stop` is set then, so the sources running in threads stop as well.
+    """
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    # Scrapy installs its own shutdown handlers and leaves them in place afterwards;
+    # the old ones are put back at the end so Ctrl+C still reaches main()
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGINT, signal.SIGTERM)}
+    process = CrawlerProcess(get_project_settings())
+    for name in names:
+        run = runs[name] = SourceRun(name)
+        run.started = time.perf_counter()
+        crawler = process.create_crawler(name)
+
+        def finished(spider, reason, run=run, crawler=crawler):
+            run.finished = time.perf_counter()
+            # Items that got past the pipeline's validation and dedup
+            run.items = crawler.stats.get_value('item_scraped_count', 0)
+            if reason != 'finished':
+                run.error = f"closed: {reason}"
+            if reason == 'shutdown':
+                stop.set()
+
+        # weak=False: the dispatcher would otherwise drop these closures once the loop moves on
+        crawler.signals.connect(finished, signal=signals.spider_closed, weak=False)
+        process.crawl(crawler)
+    # The reactor must run in the main thread
+    try:
+        process.start()
+    finally:
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+
+
+def deep_crawl(stop):
+    from gaming_crawler.spiders import general_crawler
+    return general_crawler.main(stop=stop)
+
+
+def fetch_reddit(stop):
+    import reddit_news
+    return reddit_news.main(stop=stop)
+
+
+def run_pipeline_steps(build_index):
+    """Consolidate the new output, then optionally embed and index it incrementally
+
+    3_build_index.py --incremental keeps the saved index's type and settings.
+    """
+    steps = [[sys.executable, '1_consolidate_data.py']]
+    if build_index:
+        steps += [[sys.executable, '2_generate_embeddings.py', '--incremental'],
+                  [sys.executable, '3_build_index.py', '--incremental']]
+    for step in steps:
+        print(f"\n>>> {' '.join(step[1:])}")
+        start = time.perf_counter()
+        subprocess.run(step, cwd=PIPELINE_DIR, check=True)
+        print(f"<<< {step[1]} took {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    os.chdir(CRAWLER_DIR)
+    sys.path.insert(0, CRAWLER_DIR)
+    from scrapy.utils.project import get_project_settings
+    from scrapy.spiderloader import SpiderLoader
+
+    available = SpiderLoader.from_settings(get_project_settings()).list()
+    parser = argparse.ArgumentParser(description="Run every crawler concurrently in one process")
+    parser.add_argument('--spiders', default=','.join(available),
+                        help=f"Comma-separated Scrapy spiders (default: all of {', '.join(available)})")
+    parser.add_argument('--skip-deep', action='store_true', help="Don't run the general deep crawler")
+    parser.add_argument('--skip-reddit', action='store_true', help="Don't fetch Reddit")
+    parser.add_argument('--consolidate', action='store_true', help="Run 1_consolidate_data.py afterwards")
+    parser.add_argument('--index', action='store_true',
+                        help="Consolidate, then update embeddings and the index incrementally")
+    args = parser.parse_args()
+    spiders = [name for name in args.spiders.split(',') if name]
+
+    runs = {}
+    threads = []
+    # Set on Ctrl+C; the threaded sources check it and stop early
+    stop = threading.Event()
+    start = time.perf_counter()
+    if not args.skip_deep:
+        runs['general_crawler'] = SourceRun('general_crawler')
+        threads.append(run_in_thread(runs['general_crawler'], lambda: deep_crawl(stop)))
+    if not args.skip_reddit:
+        runs['reddit'] = SourceRun('reddit')
+        threads.append(run_in_thread(runs['reddit'], lambda: fetch_reddit(stop)))
+
+    try:
+        if spiders:
+            run_spiders(spiders, runs, stop)
+        if stop.is_set():
+            print("\nInterrupted, stopping the other sources...")
+        wait_for(threads)
+    except KeyboardInterrupt:
+        print("\nInterrupted, stopping the other sources...")
+        stop.set()
+        wait_for(threads)
+    if stop.is_set():
+        for name in ('general_crawler', 'reddit'):
+            if name in runs and not runs[name].error:
+                runs[name].error = "interrupted"
+    total = time.perf_counter() - start
+
+    print(f"\n{'source':<22}{'seconds':>9}{'new items':>11}  status")
+    for run in runs.values():
+        print(f"{run.name:<22}{run.seconds:>9.1f}{run.items:>11}  {run.error or 'ok'}")
+    slowest = max((run.seconds for run in runs.values()), default=0.0)
+    print(f"{'total wall time':<22}{total:>9.1f}   (slowest source {slowest:.1f}s, "
+          f"sum of sources {sum(run.seconds for run in runs.values()):.1f}s)")
+
+    os.makedirs('logs', exist_ok=True)
+    with open(os.path.join('logs', 'last_crawl_summary.json'), 'w', encoding='utf-8') as f:
+        json.dump({'crawl_date': datetime.now().isoformat(), 'seconds': round(total, 1),
+                   'sources': {name: run.as_dict() for name, run in runs.items()}}, f, indent=2)
+
+    failed = [run.name for run in runs.values() if run.error]
+    if (args.consolidate or args.index) and not stop.is_set():
+        run_pipeline_steps(args.index)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# reddit_news.py, bench_reddit.py and gaming_crawler/ are imported from crawler/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,76 @@
+import glob
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import praw
+import pytest
+
+import reddit_news
+from bench_reddit import FakeReddit, make_handler
+
+SUBREDDITS = ['gamingnews', 'pcgaming']
+
+
+@pytest.fixture
+def fake_reddit():
+    fake = FakeReddit(SUBREDDITS)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(fake, latency=0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}'
+    factory = lambda: praw.Reddit(
+        client_id='test', client_secret='test', user_agent='test_reddit_news/1.0',
+        oauth_url=url, reddit_url=url, check_for_updates=False, check_for_async=False)
+    yield fake, factory
+    server.shutdown()
+
+
+def saved_ids(output_dir):
+    ids = []
+    for path in glob.glob(os.path.join(output_dir, 'reddit_data', 'part-*.jsonl')):
+        with open(path, 'r', encoding='utf-8') as f:
+            ids.extend(json.loads(line)['id'] for line in f if line.strip())
+    return ids
+
+
+def run(output_dir, factory):
+    return reddit_news.main(subreddits=SUBREDDITS, output_dir=output_dir, reddit_factory=factory, workers=2)
+
+
+def test_second_run_saves_only_the_new_posts(fake_reddit, tmp_path):
+    fake, factory = fake_reddit
+    first = run(str(tmp_path), factory)
+    assert first == 25 * len(SUBREDDITS)
+
+    fake.add_posts(7)
+    assert run(str(tmp_path), factory) == 7 * len(SUBREDDITS)
+
+    ids = saved_ids(str(tmp_path))
+    assert len(ids) == first + 7 * len(SUBREDDITS)
+    assert len(set(ids)) == len(ids)
+
+
+def test_post_with_the_watermark_timestamp_is_not_dropped(fake_reddit, tmp_path):
+    fake, factory = fake_reddit
+    run(str(tmp_path), factory)
+
+    # A different post created in the same second as the watermark post
+    with fake.lock:
+        newest = fake.posts['pcgaming'][-1]
+        fake.next_id += 1
+        post_id = format(fake.next_id, 'x')
+        fake.posts['pcgaming'].append(dict(newest, id=post_id, name=f't3_{post_id}',
+                                           url=f'https://example.com/pcgaming/{post_id}'))
+
+    assert run(str(tmp_path), factory) == 1
+    ids = saved_ids(str(tmp_path))
+    assert post_id in ids
+    assert len(set(ids)) == len(ids)
+
+
+def test_quiet_run_saves_nothing(fake_reddit, tmp_path):
+    fake, factory = fake_reddit
+    run(str(tmp_path), factory)
+    assert run(str(tmp_path), factory) == 0
+    assert len(saved_ids(str(tmp_path))) == 25 * len(SUBREDDITS)
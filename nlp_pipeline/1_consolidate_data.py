@@ -1,65 +1,93 @@
-import pandas as pd
+import argparse
 import glob
 import os
-from io import StringIO
+
+from corpus_stream import CORPUS_FILE, BloomDeduper, CorpusWriter, UrlDeduper, iter_json_records, normalize_record
+from manifest import DocManifest, document_text
+
+parser = argparse.ArgumentParser(description=f"Consolidate all crawler output into {CORPUS_FILE}")
+parser.add_argument('--chunk-size', type=int, default=10000, help="Rows per Parquet row group")
+parser.add_argument('--bloom-capacity', type=int, default=0,
+                    help="Dedup URLs with a fixed-size Bloom filter sized for this many URLs "
+                         "(default: exact dedup on 64-bit URL fingerprints)")
+parser.add_argument('--csv', action='store_true', help="Also export the corpus as all_data.csv")
+parser.add_argument('--reset-ids', action='store_true',
+                    help="Renumber doc ids from 0 (requires a full, non-incremental run of steps 2 and 3)")
+args = parser.parse_args()
 
 # Define the path to the crawler directory
 crawler_path = '../crawler'
-# Find all JSON files in the crawler directory
-json_files = glob.glob(os.path.join(crawler_path, '*.json'))
+# Find all JSON / JSON-lines files in the crawler directory, plus the
+# append-only segments the crawlers write to output/<name>/part-*.jsonl
+json_files = sorted(glob.glob(os.path.join(crawler_path, '*.json')) +
+                    glob.glob(os.path.join(crawler_path, '*.jsonl')) +
+                    glob.glob(os.path.join(crawler_path, 'output', '*', '*.jsonl')))
 
 if not json_files:
     print("No JSON files found in the crawler directory. Please run your crawlers first.")
 else:
     print(f"Found {len(json_files)} JSON files to process.")
-    
-    df_list = []
 
-    for file in json_files:
-        print(f"Processing {os.path.basename(file)}...")
-        try:
-            with open(file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            if not content:
-                print(f" - Warning: {os.path.basename(file)} is empty. Skipping.")
-                continue
+    # Records are streamed one at a time from every file, cleaned and
+    # deduplicated on the fly, and written out in chunks, so memory use does
+    # not grow with the size of the crawl archive.
+    seen_urls = BloomDeduper(args.bloom_capacity) if args.bloom_capacity else UrlDeduper()
+    # Every document keeps its doc id (= FAISS id) across runs unless its text changes
+    manifest = (None if args.reset_ids else DocManifest.load()) or DocManifest()
+    output_filename = CORPUS_FILE
+    total = 0
+    failed = []
 
-            fixed_content = content.replace('][', ',')
-            
-            df = pd.read_json(StringIO(fixed_content))
-            df_list.append(df)
-        except Exception as e:
-            print(f" - Could not process {file}. Error: {e}")
+    writer = CorpusWriter(output_filename, csv_path='all_data.csv' if args.csv else None)
+    try:
+        chunk = []
 
-    if not df_list:
-        print("\nNo data was loaded from any of the files.")
-    else:
-        print("\nConsolidating all data...")
-        master_df = pd.concat(df_list, ignore_index=True)
+        for file in json_files:
+            name = os.path.relpath(file, crawler_path)
+            print(f"Processing {name}...")
+            if os.path.getsize(file) == 0:
+                print(f" - Warning: {name} is empty. Skipping.")
+                continue
 
-        # --- CORRECTED Data Cleaning and Normalization ---
-        # 1. Coalesce all 'title-like' columns into a single 'title' column
-        if 'job_title' in master_df.columns:
-            master_df['title'] = master_df['title'].fillna(master_df['job_title'])
-        if 'guide_title' in master_df.columns:
-            master_df['title'] = master_df['title'].fillna(master_df['guide_title'])
-        
-        # 2. Drop the old, now redundant columns
-        master_df.drop(columns=['job_title', 'guide_title'], errors='ignore', inplace=True)
+            kept = skipped = 0
+            try:
+                for record in iter_json_records(file):
+                    # Coalesce title / job_title / guide_title and drop untitled records
+                    row = normalize_record(record)
+                    if row is None or not seen_urls.add(row['url']):
+                        skipped += 1
+                        continue
+                    row['doc_id'] = manifest.assign(row['url'], document_text(row['title'], row['summary']))
+                    chunk.append(row)
+                    kept += 1
+                    if len(chunk) >= args.chunk_size:
+                        writer.write(chunk)
+                        chunk = []
+            except Exception as e:
+                print(f" - Could not process {file}. Error: {e}")
+                failed.append(name)
+            print(f" - {kept} documents kept, {skipped} untitled or duplicate records skipped")
+            total += kept
 
-        # 3. Now that 'title' is consolidated, drop any rows where it's still missing
-        master_df.dropna(subset=['title'], inplace=True)
-        
-        if 'summary' in master_df.columns:
-            master_df['summary'] = master_df['summary'].fillna('')
-        
-        master_df.drop_duplicates(subset=['url'], inplace=True)
+        writer.write(chunk)
+    except BaseException:
+        # Keep the previous corpus rather than swapping in a partial one
+        writer.abort()
+        raise
+    writer.close()
 
-        # --- Save the Consolidated Data ---
-        output_filename = 'all_data.csv'
-        master_df.to_csv(output_filename, index=False)
+    if failed:
+        # Their unread documents would otherwise lose their ids and be re-embedded
+        # once the files read again; stale ones are dropped on the next clean run
+        removed = 0
+        print(f"\nKeeping documents not seen this run, since {len(failed)} file(s) failed: {', '.join(failed)}")
+    else:
+        removed = manifest.drop_unseen()
+    manifest.save()
 
+    if total == 0:
+        print("\nNo data was loaded from any of the files.")
+    else:
         print(f"\nSuccessfully consolidated and cleaned data.")
-        print(f"Total documents: {len(master_df)}")
-        print(f"Data saved to {output_filename}")
\ No newline at end of file
+        print(f"Total documents: {total} ({removed} removed since the last run)")
+        print(f"Data saved to {output_filename}")
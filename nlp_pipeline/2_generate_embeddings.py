@@ -1,36 +1,98 @@
-import pandas as pd
+import argparse
+import json
+import os
+
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
-print("Loading pre-trained NLP model...")
-# This model is fast and effective for semantic search
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from corpus_stream import CORPUS_FILE, read_corpus
+from manifest import DocManifest, append_rows, document_text
+from parallel_encode import MODEL_NAME, encode_into, token_lengths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Generate embeddings for {CORPUS_FILE}")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only embed documents that are new or changed since the last run")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Encoder processes, each using an equal share of the CPU threads")
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    output_embeddings_file = 'embeddings.npy'
+    # Records which doc id numbering embeddings.npy was built for
+    embeddings_meta_file = 'embeddings.json'
+
+    print(f"Reading consolidated data from {CORPUS_FILE}...")
+    # Only the columns we embed are read from the Parquet corpus
+    df = read_corpus(columns=['doc_id', 'title', 'summary']).to_pandas()
+    manifest = DocManifest.load()
+
+    # Row i of embeddings.npy is the vector for doc id i. Doc ids only ever grow
+    # and a changed document gets a new id, so every id below the 'rows'
+    # watermark of the last successful run is already embedded. Rows past it
+    # were allocated by a run that did not finish and are encoded again.
+    existing_rows = 0
+    file_rows = 0
+    if args.incremental and os.path.exists(output_embeddings_file) and os.path.exists(embeddings_meta_file):
+        with open(embeddings_meta_file, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('epoch') == manifest.epoch:
+            file_rows = len(np.load(output_embeddings_file, mmap_mode='r'))
+            existing_rows = min(int(meta.get('rows', 0)), file_rows)
+        else:
+            print("Doc ids were renumbered since the last run, re-embedding everything.")
+    elif args.incremental:
+        print(f"No {output_embeddings_file} from a previous run, doing a full run instead.")
+
+    todo = df[df['doc_id'] >= existing_rows]
+    print(f"{len(todo)} documents to embed ({len(df) - len(todo)} unchanged).")
 
-print("Reading consolidated data from all_data.csv...")
-df = pd.read_csv('all_data.csv')
+    # We'll create embeddings based on the title and summary for better context
+    sentences = [document_text(t, s) for t, s in zip(todo['title'], todo['summary'])]
 
-# We'll create embeddings based on the title and summary for better context
-# First, ensure the summary column exists and is a string
-if 'summary' not in df.columns:
-    df['summary'] = ''
-df['summary'] = df['summary'].astype(str).fillna('')
+    print("Loading pre-trained NLP model...")
+    # This model is fast and effective for semantic search
+    model = SentenceTransformer(MODEL_NAME)
+    d = model.get_sentence_embedding_dimension()
 
-# Combine title and summary into a single text field
-sentences = (df['title'] + ". " + df['summary']).tolist()
+    # Until this run finishes, only the rows embedded so far count as done
+    with open(embeddings_meta_file, 'w', encoding='utf-8') as f:
+        json.dump({'epoch': manifest.epoch, 'rows': existing_rows}, f)
 
-print(f"Generating embeddings for {len(sentences)} documents... (This may take a few moments)")
+    # --- Preallocate the output ---
+    # New rows cover every id issued since the last run; ids that were issued
+    # and removed again before being embedded stay as zero rows
+    new_rows = manifest.next_id - file_rows
+    if existing_rows == 0:
+        new_rows = manifest.next_id
+        print(f"\nAllocating {output_embeddings_file} for {new_rows} documents...")
+        # A new file rather than truncating the old one, which a running
+        # backend may have memory-mapped
+        if os.path.exists(output_embeddings_file):
+            os.remove(output_embeddings_file)
+        np.lib.format.open_memmap(output_embeddings_file, mode='w+', dtype='float32',
+                                  shape=(new_rows, d)).flush()
+    elif new_rows > 0:
+        print(f"\nAppending {new_rows} rows to {output_embeddings_file}...")
+        append_rows(output_embeddings_file, np.zeros((new_rows, d), dtype='float32'))
 
-# Generate the embeddings. The model will show a progress bar.
-embeddings = model.encode(sentences, show_progress_bar=True)
+    if sentences:
+        print(f"Generating embeddings for {len(sentences)} documents with {args.workers} worker(s)...")
+        # Sorting by token length keeps padding per batch to a minimum
+        rate = encode_into(
+            output_embeddings_file, todo['doc_id'].to_numpy(), sentences, workers=args.workers,
+            batch_size=args.batch_size, lengths=token_lengths(model, sentences),
+            model=model if args.workers == 1 else None,
+        )
+        print(f"Encoded {len(sentences)} documents at {rate:.1f} docs/sec")
 
-# --- Save the Embeddings and Corresponding URLs ---
-output_embeddings_file = 'embeddings.npy'
-output_urls_file = 'urls.csv'
+    with open(embeddings_meta_file, 'w', encoding='utf-8') as f:
+        json.dump({'epoch': manifest.epoch, 'rows': manifest.next_id}, f)
 
-print(f"\nSaving embeddings to {output_embeddings_file}...")
-np.save(output_embeddings_file, embeddings)
+    print("\nEmbeddings generated and saved successfully! 🎉")
 
-print(f"Saving corresponding URLs to {output_urls_file}...")
-df['url'].to_csv(output_urls_file, index=False)
 
-print("\nEmbeddings generated and saved successfully! 🎉")
\ No newline at end of file
+# Worker processes re-import this file, so the work must only run from here
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,198 @@
+import argparse
+import os
+import time
+
 import numpy as np
 import faiss
 
+from doc_features import RANKING_CONFIG, build_features, load_keyword_groups, save_features
+from doc_store import DOC_STORE_DIR, DocStore
+from lexical_index import build_lexical_index
+from index_utils import (COMPRESSED_TYPES, INDEX_TYPES, build_index, load_index, rescored_search, save_index,
+                         set_search_params, update_index)
+from manifest import DocManifest
+
+# Index options and their defaults. They are parsed as None ("not given"), so an
+# --incremental run without any of them can keep the settings of the saved index.
+INDEX_DEFAULTS = {'index_type': 'flat', 'pca': None, 'rescore': None, 'nlist': None, 'nprobe': 8,
+                  'pq_m': 16, 'pq_nbits': 8, 'hnsw_m': 32, 'ef_construction': 200, 'ef_search': 64}
+
+parser = argparse.ArgumentParser(description="Build the FAISS search index from embeddings.npy")
+parser.add_argument('--index-type', choices=INDEX_TYPES, default=None,
+                    help="flat = exact search; ivfflat / ivfpq / hnsw = approximate, for large corpora; "
+                         "sq8 / sqfp16 = exact scan over 8-bit / float16 codes (4x / 2x less memory); "
+                         "default flat")
+parser.add_argument('--pca', type=int, default=None,
+                    help="Reduce vectors to this many dimensions with PCA before indexing")
+parser.add_argument('--rescore', type=int, default=None,
+                    help="Fetch this many times more candidates and re-score them exactly from "
+                         "embeddings.npy (default 4 for compressed indexes, 0 = off)")
+parser.add_argument('--nlist', type=int, default=None, help="IVF: number of clusters (default ~4*sqrt(n))")
+parser.add_argument('--nprobe', type=int, default=None, help="IVF: clusters visited per query (default 8)")
+parser.add_argument('--pq-m', type=int, default=None,
+                    help="IVFPQ: sub-quantizers (must divide the dimension, default 16)")
+parser.add_argument('--pq-nbits', type=int, default=None, help="IVFPQ: bits per sub-quantizer code (default 8)")
+parser.add_argument('--hnsw-m', type=int, default=None, help="HNSW: neighbours per node (default 32)")
+parser.add_argument('--ef-construction', type=int, default=None, help="HNSW: build-time search depth (default 200)")
+parser.add_argument('--ef-search', type=int, default=None, help="HNSW: query-time search depth (default 64)")
+parser.add_argument('--incremental', action='store_true',
+                    help="Add/remove only the documents that changed since the index was built; "
+                         "without index options, the saved index's type and settings are kept")
+parser.add_argument('--report', action='store_true',
+                    help="Print recall@k and latency against an exact Flat index")
+parser.add_argument('--report-k', type=int, default=10)
+parser.add_argument('--report-queries', type=int, default=500)
+parser.add_argument('--ranking-config', default=RANKING_CONFIG,
+                    help="Ranking rules whose keyword groups get a bit in doc_features.npy")
+args = parser.parse_args()
+
+output_index_file = 'faiss_index.bin'
+
 print("Loading embeddings from embeddings.npy...")
-embeddings = np.load('embeddings.npy').astype('float32')
+# Memory-mapped: an incremental update only reads the rows it adds
+embeddings = np.load('embeddings.npy', mmap_mode='r')
 
 # The dimension of our embeddings is 384 for the 'all-MiniLM-L6-v2' model
 d = embeddings.shape[1]
 
-print(f"Building FAISS index for {embeddings.shape[0]} vectors of dimension {d}...")
+# Row i of embeddings.npy is doc id i; the manifest says which ids are live
+manifest = DocManifest.load()
+live_ids = manifest.live_ids() if manifest else np.arange(len(embeddings), dtype=np.int64)
 
-# We will use a simple L2 (Euclidean distance) index
-index = faiss.IndexFlatL2(d)
-index.add(embeddings)
+index = saved = None
+if args.incremental and os.path.exists(output_index_file):
+    index, saved = load_index(output_index_file)
+
+given = {name: getattr(args, name) for name in INDEX_DEFAULTS if getattr(args, name) is not None}
+if saved is not None and not given:
+    # Keep the index chosen when it was built (older faiss_index.json files lack the build settings)
+    given = {name: saved[name] for name in INDEX_DEFAULTS if saved.get(name) is not None}
+    print(f"Keeping the saved index settings: {', '.join(f'{k}={v}' for k, v in given.items())}")
+for name, default in INDEX_DEFAULTS.items():
+    setattr(args, name, given.get(name, default))
+
+if index is not None:
+    if saved['index_type'] != args.index_type or saved.get('pca') != args.pca \
+            or not isinstance(index, faiss.IndexIDMap):
+        print("Existing index has a different type or no doc ids, rebuilding it.")
+        index = None
+    else:
+        try:
+            added, removed = update_index(index, embeddings, live_ids)
+            print(f"Updated index in place: +{len(added)} / -{len(removed)} vectors.")
+        except RuntimeError:
+            print(f"{args.index_type} indexes cannot remove vectors, rebuilding it.")
+            index = None
+
+if index is None:
+    print(f"Building {args.index_type} FAISS index for {len(live_ids)} vectors of dimension {d}...")
+    index = build_index(
+        np.ascontiguousarray(embeddings[live_ids], dtype='float32'), args.index_type,
+        nlist=args.nlist, pq_m=args.pq_m, pq_nbits=args.pq_nbits,
+        hnsw_m=args.hnsw_m, ef_construction=args.ef_construction, ids=live_ids, pca_dim=args.pca,
+    )
+compressed = args.index_type in COMPRESSED_TYPES or bool(args.pca)
+params = {
+    'index_type': args.index_type,
+    'nprobe': args.nprobe if args.index_type.startswith('ivf') else None,
+    'ef_search': args.ef_search if args.index_type == 'hnsw' else None,
+    'pca': args.pca,
+    # The backend re-scores candidates from embeddings.npy, so its rows must stay doc ids
+    'rescore': args.rescore if args.rescore is not None else (4 if compressed else 0),
+    # Build settings, reused when an --incremental run has to rebuild the index
+    'nlist': args.nlist,
+    'pq_m': args.pq_m,
+    'pq_nbits': args.pq_nbits,
+    'hnsw_m': args.hnsw_m,
+    'ef_construction': args.ef_construction,
+}
+set_search_params(index, params['nprobe'], params['ef_search'])
+
+
+def timed_search(idx, queries, k, rescore=0):
+    """Search one query at a time, like the API does; returns (ids, ms/query)"""
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        _, ids[i] = rescored_search(idx, queries[i:i + 1], k, embeddings, rescore)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def index_bytes(idx):
+    """(bytes per vector, fixed bytes) of a serialized index.
+
+    Fixed costs (PCA matrix, IVF centroids, PQ codebooks, ...) are measured on
+    an emptied copy, so they are not spread over the vectors of a small corpus.
+    """
+    empty = faiss.clone_index(idx)
+    empty.reset()
+    fixed = len(faiss.serialize_index(empty))
+    return (len(faiss.serialize_index(idx)) - fixed) / idx.ntotal, fixed
+
+
+def recall(found, truth):
+    return np.mean([len(set(found[i]) & set(truth[i])) / truth.shape[1] for i in range(len(truth))])
+
+
+if args.report:
+    vectors = np.ascontiguousarray(embeddings[live_ids], dtype='float32')
+    k = min(args.report_k, len(vectors))
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(vectors), size=min(args.report_queries, len(vectors)), replace=False)
+    # Perturb the sampled vectors so queries are not exact copies of indexed points
+    queries = vectors[sample] + rng.normal(0, 0.01, size=(len(sample), d)).astype('float32')
+
+    baseline = faiss.IndexIDMap(faiss.IndexFlatL2(d))
+    baseline.add_with_ids(vectors, live_ids)
+    truth, flat_ms = timed_search(baseline, queries, k)
+
+    # Bytes per document = MB per million documents (ids included)
+    flat_bytes, _ = index_bytes(baseline)
+    per_vector, fixed = index_bytes(index)
+    index_name = args.index_type + (f" + pca {args.pca}" if args.pca else "")
+    print(f"\n--- memory per 1M docs: flat {flat_bytes:.0f} MB, {index_name} {per_vector:.0f} MB "
+          f"({flat_bytes / per_vector:.1f}x smaller), plus {fixed / 1024:.1f} KB fixed ---")
+
+    rescored = f", re-scoring {params['rescore']}x candidates" if params['rescore'] else ""
+    print(f"\n--- recall@{k} vs exact Flat ({len(queries)} queries{rescored}) ---")
+    print(f"{'setting':<18}{'recall':>8}{'ms/query':>10}")
+    print(f"{'flat':<18}{1.0:>8.3f}{flat_ms:>10.3f}")
+    if args.index_type.startswith('ivf'):
+        sweep = [('nprobe', v) for v in (1, 2, 4, 8, 16, 32, 64) if v <= faiss.try_extract_index_ivf(index).nlist]
+    elif args.index_type == 'hnsw':
+        sweep = [('efSearch', v) for v in (16, 32, 64, 128, 256)]
+    else:
+        sweep = [(index_name, None)]
+    for name, value in sweep:
+        set_search_params(index, nprobe=value if name == 'nprobe' else None,
+                          ef_search=value if name == 'efSearch' else None)
+        found, ms = timed_search(index, queries, k, params['rescore'])
+        setting = name if value is None else f"{name}={value}"
+        print(f"{setting:<18}{recall(found, truth):>8.3f}{ms:>10.3f}")
+    # Leave the index configured with the requested defaults
+    set_search_params(index, params['nprobe'], params['ef_search'])
+    if compressed:
+        print(f"\n{'rescore factor':<18}{'recall':>8}{'ms/query':>10}")
+        for factor in (0, 1, 2, 4, 8):
+            found, ms = timed_search(index, queries, k, factor)
+            print(f"{factor or 'off':<18}{recall(found, truth):>8.3f}{ms:>10.3f}")
 
-output_index_file = 'faiss_index.bin'
 print(f"Saving index to {output_index_file}...")
-faiss.write_index(index, output_index_file)
+save_index(index, output_index_file, params)
+
+# Per-doc ranking features, aligned to the same ids as the index
+features, meta = build_features('.', load_keyword_groups(args.ranking_config))
+save_features('.', features, meta)
+print(f"Saved ranking features for {len(features)} doc ids ({features.nbytes / 1024:.1f} KB) "
+      f"to doc_features.npy")
+
+# Display fields as memory-mappable arrays, shared by all server workers
+doc_store = DocStore.from_corpus('.')
+doc_store.save(DOC_STORE_DIR)
+print(f"Saved {len(doc_store)} documents ({doc_store.nbytes / 1024:.1f} KB) to {DOC_STORE_DIR}/")
+
+# BM25 index over the same documents, for exact-term matches
+lexical = build_lexical_index('.')
+print(f"Saved lexical index: {lexical['terms']} terms, {lexical['postings']} postings to lexical_index/")
 
-print("\nIndex built and saved successfully! Ready to search. 🚀")
\ No newline at end of file
+print("\nIndex built and saved successfully! Ready to search. 🚀")
@@ -1,20 +1,62 @@
+import argparse
+import json
+import time
+
 import numpy as np
-import faiss
-import pandas as pd
-from sentence_transformers import SentenceTransformer
+
+from doc_store import DocStore
+from index_utils import load_index, rescored_search
+from onnx_encoder import load_encoder
+
+parser = argparse.ArgumentParser(description="Search the index from the command line")
+parser.add_argument('--encoder', choices=['torch', 'onnx'], default='torch',
+                    help="'onnx' uses the int8 model from `python onnx_encoder.py export`")
+parser.add_argument('--queries-file', default=None,
+                    help="Search every line of this file instead of asking, and write JSON lines")
+parser.add_argument('--output', default='search_results.jsonl', help="Where --queries-file results go")
+parser.add_argument('--k', type=int, default=5, help="Results per query")
+parser.add_argument('--batch-size', type=int, default=1000,
+                    help="Queries searched together in --queries-file mode (FAISS gains most from hundreds)")
+parser.add_argument('--encode-batch-size', type=int, default=32,
+                    help="Sentences per model forward pass; bigger passes pad more and are not faster")
+args = parser.parse_args()
 
 print("Loading tools for search...")
 # Load the AI model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+model = load_encoder(args.encoder)
 
-# Load the FAISS index
-index = faiss.read_index('faiss_index.bin')
+# Load the FAISS index (any type 3_build_index.py produced, with its search params)
+index, params = load_index('faiss_index.bin')
+# Compressed indexes re-score their candidates from the float32 vectors
+embeddings = np.load('embeddings.npy', mmap_mode='r') if params['rescore'] else None
 
-# Load the original data to display results
-df = pd.read_csv('all_data.csv')
+# Load the fields we display, packed into a compact store aligned to FAISS ids
+docs = DocStore.load('.')
 print("Ready to search!")
 print("--------------------")
 
+if args.queries_file:
+    # Offline mode: one encode call and one multi-query index search per batch
+    with open(args.queries_file, 'r', encoding='utf-8') as f:
+        queries = [line.strip() for line in f if line.strip()]
+    start = time.perf_counter()
+    with open(args.output, 'w', encoding='utf-8') as out:
+        for first in range(0, len(queries), args.batch_size):
+            batch = queries[first:first + args.batch_size]
+            query_embeddings = np.asarray(model.encode(batch, batch_size=args.encode_batch_size), dtype='float32')
+            distances, indices = rescored_search(index, query_embeddings, args.k, embeddings, params['rescore'])
+            for query, row_ids, row_distances in zip(batch, indices, distances):
+                # FAISS pads with -1 when it finds fewer than k neighbours
+                found = (row_ids >= 0) & (row_ids < len(docs))
+                results = docs.gather(row_ids[found])
+                for doc, distance in zip(results, row_distances[found].tolist()):
+                    doc['distance'] = distance
+                out.write(json.dumps({'query': query, 'results': results}) + '\n')
+    seconds = time.perf_counter() - start
+    print(f"Searched {len(queries)} queries in {seconds:.2f}s ({len(queries) / max(seconds, 1e-9):.0f} queries/s), "
+          f"results in {args.output}")
+    raise SystemExit
+
 # This creates an endless loop to ask for queries. Press Ctrl+C to exit.
 while True:
     query = input("Enter your search query: ")
@@ -23,19 +65,15 @@ while True:
     query_embedding = model.encode([query])
     
     # The number of results to retrieve
-    k = 5 
+    k = args.k
     
     # Perform the search
-    distances, indices = index.search(query_embedding.astype('float32'), k)
+    distances, indices = rescored_search(index, query_embedding.astype('float32'), k, embeddings, params['rescore'])
     
     print("\n--- Search Results ---")
-    for i, idx in enumerate(indices[0]):
-        # Get the title and URL from our original dataframe
-        title = df.iloc[idx]['title']
-        url = df.iloc[idx]['url']
-        source = df.iloc[idx]['source']
-        
-        print(f"{i+1}. Title: {title}")
-        print(f"   Source: {source}")
-        print(f"   URL: {url}\n")
+    # Fetch all k hits from the store in one call
+    for i, doc in enumerate(docs.gather(indices[0])):
+        print(f"{i+1}. Title: {doc['title']}")
+        print(f"   Source: {doc['source']}")
+        print(f"   URL: {doc['url']}\n")
     print("--------------------")
\ No newline at end of file
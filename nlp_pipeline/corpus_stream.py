@@ -0,0 +1,210 @@
+# Streaming readers and helpers for consolidating crawler output
+#
+# The crawlers write JSON in a few shapes: a single array, several arrays
+# glued together by repeated appends ("[...][...]"), or one object per line.
+# iter_json_records() walks any of these one record at a time, keeping only a
+# small read buffer in memory, so consolidation memory stays flat no matter
+# how large the crawl archive grows.
+#
+# The consolidated corpus is a typed, compressed Parquet file whose doc_id
+# column is the FAISS id of each row. Later stages read only the columns they
+# need (and can filter on source or date) with read_corpus().
+
+import hashlib
+import json
+import math
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+CORPUS_FILE = 'all_data.parquet'
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+# Title-like fields used by the different spiders, in order of preference
+TITLE_FIELDS = ['title', 'job_title', 'guide_title']
+
+# Columns of the consolidated corpus, in output order
+CORPUS_SCHEMA = pa.schema([
+    ('doc_id', pa.int64()),
+    ('title', pa.string()),
+    ('url', pa.string()),
+    ('summary', pa.string()),
+    ('source', pa.string()),
+    ('content', pa.string()),
+    ('date', pa.string()),
+    ('score', pa.int64()),
+    ('id', pa.string()),
+    ('subreddit', pa.string()),
+    ('created_utc', pa.float64()),
+    ('num_comments', pa.int64()),
+    ('company', pa.string()),
+    ('location', pa.string()),
+    ('game_name', pa.string()),
+    ('platform', pa.string()),
+    ('author', pa.string()),
+])
+CORPUS_COLUMNS = CORPUS_SCHEMA.names
+
+
+def iter_json_records(path, chunk_size=1 << 16):
+    """Yield every JSON object in a file of arrays and/or JSON lines"""
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        while True:
+            # Skip whitespace and array punctuation between records
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE + '[],':
+                pos += 1
+            if pos >= len(buffer):
+                if eof:
+                    return
+                buffer = f.read(chunk_size)
+                pos = 0
+                eof = not buffer
+                continue
+            try:
+                record, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The record continues past the end of the buffer: read more
+                more = f.read(chunk_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            pos = end
+            if isinstance(record, dict):
+                yield record
+
+
+def _coerce(value, type_):
+    """Convert a JSON value to the column type, or None if it does not fit"""
+    if value is None:
+        return None
+    try:
+        if pa.types.is_integer(type_):
+            return int(value)
+        if pa.types.is_floating(type_):
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def normalize_record(record):
+    """Typed corpus row with a coalesced 'title'; None if the record has no title"""
+    title = None
+    for field in TITLE_FIELDS:
+        value = record.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if value:
+            title = value
+            break
+    if title is None:
+        return None
+    row = {field.name: _coerce(record.get(field.name), field.type) for field in CORPUS_SCHEMA}
+    row['title'] = title
+    if row['summary'] is None:
+        row['summary'] = ''
+    return row
+
+
+def _fingerprint(url):
+    return int.from_bytes(hashlib.blake2b((url or '').encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class UrlDeduper:
+    """Exact URL dedup holding a 64-bit fingerprint per URL instead of the URL"""
+
+    def __init__(self):
+        self._seen = set()
+
+    def add(self, url):
+        """True if the URL is new"""
+        fp = _fingerprint(url)
+        if fp in self._seen:
+            return False
+        self._seen.add(fp)
+        return True
+
+
+class BloomDeduper:
+    """Fixed-memory URL dedup for very large crawls.
+
+    May wrongly treat a small fraction (`error_rate`) of new URLs as already
+    seen, but never lets a duplicate through.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def add(self, url):
+        digest = hashlib.blake2b((url or '').encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        is_new = False
+        for i in range(self.num_hashes):
+            bit = (h1 + i * h2) % self.num_bits
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self._bits[byte] & mask:
+                self._bits[byte] |= mask
+                is_new = True
+        return is_new
+
+
+class CorpusWriter:
+    """Writes corpus rows to Parquet in row groups, optionally exporting CSV too
+
+    Rows go to .tmp files; close() swaps them in once the corpus is complete and
+    abort() deletes them, leaving the previous corpus untouched.
+    """
+
+    def __init__(self, path=CORPUS_FILE, csv_path=None):
+        self.path = path
+        self._tmp_path = path + '.tmp'
+        self._writer = pq.ParquetWriter(self._tmp_path, CORPUS_SCHEMA, compression='zstd')
+        self._csv_path = csv_path
+        self._csv_tmp_path = csv_path + '.tmp' if csv_path else None
+        self._csv_header = True
+
+    def write(self, rows):
+        if not rows:
+            return
+        table = pa.Table.from_pylist(rows, schema=CORPUS_SCHEMA)
+        self._writer.write_table(table)
+        if self._csv_path:
+            table.to_pandas().to_csv(self._csv_tmp_path, mode='w' if self._csv_header else 'a',
+                                     header=self._csv_header, index=False)
+            self._csv_header = False
+
+    def close(self):
+        """Finish the corpus and replace the previous one; call only on success"""
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+        if self._csv_path and not self._csv_header:
+            os.replace(self._csv_tmp_path, self._csv_path)
+
+    def abort(self):
+        """Discard a partly written corpus"""
+        self._writer.close()
+        for path in (self._tmp_path, self._csv_tmp_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def read_corpus(path=CORPUS_FILE, columns=None, filters=None):
+    """Read selected corpus columns as a pyarrow Table.
+
+    The file is memory-mapped and only the requested columns are decoded;
+    `filters` (e.g. [('source', 'in', ['IGN', 'GameSpot'])]) are pushed down
+    so row groups that cannot match are skipped.
+    """
+    return pq.read_table(path, columns=columns, filters=filters, memory_map=True)
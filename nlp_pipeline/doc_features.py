@@ -0,0 +1,168 @@
+# Precomputed per-document ranking features aligned to FAISS ids
+#
+# Everything the re-ranker needs to know about a document is static, so it is
+# computed once here instead of from strings on every query. Row i of
+# doc_features.npy describes doc id i:
+#
+#   source        code into the source table in doc_features.json
+#                 (lowercased source names)
+#   keywords      bit g is set when the title contains a keyword of keyword
+#                 group g (the groups are listed in doc_features.json)
+#   date          publication time in epoch seconds, NaN if unknown
+#   score         Reddit score, 0 for other sources
+#   num_comments  Reddit comment count, 0 for other sources
+#
+# The file is a plain structured .npy, so the backend memory-maps it. Fetching
+# the features of k candidates is then a single fancy-index. The same columns
+# back the /search filters (filter_mask).
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from corpus_stream import CORPUS_FILE, read_corpus
+
+FEATURES_FILE = 'doc_features.npy'
+FEATURES_META_FILE = 'doc_features.json'
+# Keyword groups come from the backend's ranking rules by default
+RANKING_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'ranking.json')
+
+FEATURE_DTYPE = np.dtype([
+    ('source', np.uint16),
+    ('keywords', np.uint32),
+    ('date', np.float64),
+    ('score', np.int32),
+    ('num_comments', np.int32),
+])
+MAX_KEYWORD_GROUPS = 32
+
+
+def keyword_groups(config):
+    """Distinct keyword groups (sorted, lowercased tuples) used by any role"""
+    groups = []
+    for rules in config.get('roles', {}).values():
+        for group in rules.get('keyword_boosts', []):
+            keywords = tuple(sorted({k.lower() for k in group['keywords']}))
+            if keywords not in groups:
+                groups.append(keywords)
+    if len(groups) > MAX_KEYWORD_GROUPS:
+        raise ValueError(f"At most {MAX_KEYWORD_GROUPS} keyword groups fit in the bitmask, got {len(groups)}")
+    return groups
+
+
+def load_keyword_groups(config_path=RANKING_CONFIG):
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return keyword_groups(json.load(f))
+
+
+def _read_feature_columns(pipeline_dir):
+    """(doc ids, DataFrame) of the corpus columns the features are built from"""
+    columns = ['title', 'source', 'date', 'created_utc', 'score', 'num_comments']
+    parquet_path = os.path.join(pipeline_dir, CORPUS_FILE)
+    if os.path.exists(parquet_path):
+        df = read_corpus(parquet_path, columns=['doc_id'] + columns).to_pandas()
+        return df['doc_id'].to_numpy(), df
+    # Legacy all_data.csv: FAISS id = row number
+    csv_path = os.path.join(pipeline_dir, 'all_data.csv')
+    header = pd.read_csv(csv_path, nrows=0).columns
+    df = pd.read_csv(csv_path, usecols=[c for c in columns if c in header])
+    return np.arange(len(df), dtype=np.int64), df
+
+
+def _timestamps(df):
+    """created_utc where present, otherwise the date string if it is an absolute date"""
+    timestamps = pd.Series(np.nan, index=df.index)
+    if 'created_utc' in df:
+        timestamps = pd.to_numeric(df['created_utc'], errors='coerce')
+    if 'date' in df:
+        parsed = pd.to_datetime(df['date'], errors='coerce', utc=True, format='mixed')
+        timestamps = timestamps.fillna((parsed - pd.Timestamp(0, tz='UTC')).dt.total_seconds())
+    return timestamps.to_numpy(dtype=np.float64)
+
+
+def _counts(df, name):
+    if name not in df:
+        return np.zeros(len(df), dtype=np.int32)
+    return pd.to_numeric(df[name], errors='coerce').fillna(0).clip(-2**31, 2**31 - 1).to_numpy(np.int32)
+
+
+def build_features(pipeline_dir, groups):
+    """(features array indexed by doc id, meta dict) for the current corpus"""
+    ids, df = _read_feature_columns(pipeline_dir)
+    sources = df['source'].fillna('').astype(str).str.strip().str.lower() if 'source' in df \
+        else pd.Series('', index=df.index)
+    # Code 0 is the empty source, also used for ids without a document
+    source_names = [''] + sorted(set(sources) - {''})
+    codes = pd.Categorical(sources, categories=source_names).codes
+
+    titles = df['title'].fillna('').astype(str).str.lower() if 'title' in df else pd.Series('', index=df.index)
+    keywords = np.zeros(len(df), dtype=np.uint32)
+    for bit, group in enumerate(groups):
+        matched = np.zeros(len(df), dtype=bool)
+        for keyword in group:
+            matched |= titles.str.contains(keyword, regex=False).to_numpy()
+        keywords |= matched.astype(np.uint32) << np.uint32(bit)
+
+    size = int(ids.max()) + 1 if len(ids) else 0
+    features = np.zeros(size, dtype=FEATURE_DTYPE)
+    features['date'] = np.nan
+    keep = ids >= 0
+    rows = ids[keep]
+    features['source'][rows] = codes[keep]
+    features['keywords'][rows] = keywords[keep]
+    features['date'][rows] = _timestamps(df)[keep]
+    features['score'][rows] = _counts(df, 'score')[keep]
+    features['num_comments'][rows] = _counts(df, 'num_comments')[keep]
+    meta = {'sources': source_names, 'keyword_groups': [list(g) for g in groups], 'documents': size}
+    return features, meta
+
+
+def save_features(pipeline_dir, features, meta):
+    """Write the features and their meta; each file is swapped in whole"""
+    path = os.path.join(pipeline_dir, FEATURES_FILE)
+    meta_path = os.path.join(pipeline_dir, FEATURES_META_FILE)
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, features)
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + '.tmp', path)
+    os.replace(meta_path + '.tmp', meta_path)
+
+
+def load_features(pipeline_dir, groups):
+    """Memory-mapped features whose keyword groups match `groups`.
+
+    Falls back to building them in memory from the corpus when the file is
+    missing or was built with other keyword groups. Returns (features, meta).
+    """
+    path = os.path.join(pipeline_dir, FEATURES_FILE)
+    meta_path = os.path.join(pipeline_dir, FEATURES_META_FILE)
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if [tuple(g) for g in meta['keyword_groups']] == list(groups):
+            features = np.load(path, mmap_mode='r')
+            if features.dtype == FEATURE_DTYPE:
+                return features, meta
+        print(f"{FEATURES_FILE} was built with other ranking rules; computing features in memory.")
+    return build_features(pipeline_dir, groups)
+
+
+def filter_mask(features, meta, sources=None, date_from=None, date_to=None):
+    """Boolean mask over doc ids for the documents that pass the filters.
+
+    `sources` are matched case-insensitively; dates are epoch seconds, and
+    undated documents never pass a date filter.
+    """
+    mask = np.ones(len(features), dtype=bool)
+    if sources is not None:
+        names = {name.strip().lower() for name in sources}
+        codes = [code for code, name in enumerate(meta['sources']) if name and name in names]
+        mask &= np.isin(features['source'], codes)
+    if date_from is not None:
+        mask &= features['date'] >= date_from
+    if date_to is not None:
+        mask &= features['date'] <= date_to
+    return mask
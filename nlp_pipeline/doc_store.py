@@ -0,0 +1,149 @@
+# Compact, read-only document store aligned to FAISS ids
+#
+# Search results only ever need a handful of text fields per hit. Instead of
+# keeping the whole all_data.csv DataFrame around and calling df.iloc for
+# every field of every hit, each field is packed into one UTF-8 byte blob
+# plus an int64 offsets array: row i of a column is
+# blob[offsets[i]:offsets[i + 1]]. Fetching k rows is a single fancy-index on
+# the offsets followed by k slice-and-decode operations per column.
+#
+# 3_build_index.py saves the packed columns to doc_store/ as .npy files
+# (<column>.offsets.npy, <column>.blob.npy, written before columns.json).
+# Loading from there memory-maps them, so every server worker process reads
+# the same page-cache copy instead of parsing the corpus into its own.
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from corpus_stream import read_corpus
+
+# Fields shown for every search hit
+DISPLAY_COLUMNS = ['title', 'url', 'source', 'summary']
+DOC_STORE_DIR = 'doc_store'
+
+
+def pack_strings(values):
+    """Pack an iterable of strings into (offsets, blob)"""
+    encoded = [v.encode('utf-8') for v in values]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return offsets, blob
+
+
+class DocStore:
+    def __init__(self, columns):
+        # columns: name -> (offsets, blob)
+        self.columns = columns
+        self.size = len(next(iter(columns.values()))[0]) - 1
+
+    @classmethod
+    def from_frame(cls, df, columns=DISPLAY_COLUMNS, ids=None):
+        """Pack a DataFrame; row r goes to position ids[r] (default: r)"""
+        size = len(df)
+        if ids is not None:
+            keep = ids >= 0
+            df, ids = df[keep], ids[keep]
+            size = int(ids.max()) + 1 if len(ids) else 0
+        packed = {}
+        for name in columns:
+            if name in df.columns:
+                values = df[name].fillna('').astype(str).tolist()
+            else:
+                values = [''] * len(df)
+            if ids is not None:
+                # Ids without a row (removed documents) stay empty
+                placed = [''] * size
+                for i, value in zip(ids.tolist(), values):
+                    placed[i] = value
+                values = placed
+            packed[name] = pack_strings(values)
+        return cls(packed)
+
+    @classmethod
+    def from_parquet(cls, path, columns=DISPLAY_COLUMNS):
+        """Build from the Parquet corpus; row i is the document with doc_id i"""
+        table = read_corpus(path, columns=['doc_id'] + list(columns))
+        df = table.to_pandas()
+        return cls.from_frame(df, columns, df['doc_id'].to_numpy())
+
+    @classmethod
+    def from_csv(cls, path, columns=DISPLAY_COLUMNS):
+        """Build from a legacy all_data.csv, where FAISS id = row number"""
+        header = pd.read_csv(path, nrows=0).columns
+        df = pd.read_csv(path, usecols=[c for c in columns if c in header], dtype=str)
+        return cls.from_frame(df, columns)
+
+    @classmethod
+    def open(cls, directory):
+        """Memory-map a store written by save()"""
+        with open(os.path.join(directory, 'columns.json'), 'r', encoding='utf-8') as f:
+            names = json.load(f)['columns']
+        return cls({
+            name: (np.load(os.path.join(directory, f'{name}.offsets.npy'), mmap_mode='r'),
+                   np.load(os.path.join(directory, f'{name}.blob.npy'), mmap_mode='r'))
+            for name in names
+        })
+
+    @classmethod
+    def load(cls, pipeline_dir):
+        """The saved doc_store/ if 3_build_index.py wrote one, else built from the corpus"""
+        directory = os.path.join(pipeline_dir, DOC_STORE_DIR)
+        if os.path.exists(os.path.join(directory, 'columns.json')):
+            return cls.open(directory)
+        return cls.from_corpus(pipeline_dir)
+
+    @classmethod
+    def from_corpus(cls, pipeline_dir):
+        """Build from the pipeline's corpus, falling back to all_data.csv"""
+        parquet_path = os.path.join(pipeline_dir, 'all_data.parquet')
+        if os.path.exists(parquet_path):
+            return cls.from_parquet(parquet_path)
+        return cls.from_csv(os.path.join(pipeline_dir, 'all_data.csv'))
+
+    def save(self, directory):
+        """Write the columns to `directory`; the previous store is swapped out only once this one is complete"""
+        tmp_dir = directory + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, (offsets, blob) in self.columns.items():
+            np.save(os.path.join(tmp_dir, f'{name}.offsets.npy'), offsets)
+            np.save(os.path.join(tmp_dir, f'{name}.blob.npy'), blob)
+        with open(os.path.join(tmp_dir, 'columns.json'), 'w', encoding='utf-8') as f:
+            json.dump({'columns': list(self.columns), 'documents': self.size}, f, indent=2)
+
+        old_dir = directory + '.old'
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(directory):
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return sum(offsets.nbytes + blob.nbytes for offsets, blob in self.columns.values())
+
+    def column(self, name, ids):
+        """Values of one column for an array of row ids"""
+        offsets, blob = self.columns[name]
+        ids = np.asarray(ids, dtype=np.int64)
+        starts = offsets[ids].tolist()
+        ends = offsets[ids + 1].tolist()
+        data = blob.data
+        return [bytes(data[s:e]).decode('utf-8') for s, e in zip(starts, ends)]
+
+    def gather(self, ids, columns=None):
+        """Rows for an array of ids as a list of dicts (negative ids are skipped)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < self.size)]
+        names = columns or list(self.columns)
+        values = [self.column(name, ids) for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
@@ -0,0 +1,76 @@
+# Filtered vs unfiltered search latency at several selectivities
+#
+# /search applies source / date / role filters inside FAISS with an id
+# bitmap (index_utils.IdFilter), or for very selective filters on approximate
+# indexes by scoring the few matching vectors directly, so every query gets k
+# matching hits without over-fetching. This compares that against an
+# unfiltered search and against searching k / selectivity neighbours and
+# filtering afterwards, on synthetic unit vectors:
+#     python filter_bench.py --docs 100000 --index-type flat
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from index_utils import INDEX_TYPES, IdFilter, build_index, set_search_params
+
+
+def timed(queries, search):
+    """(ms per query, results) searching one query at a time, like the API"""
+    results = []
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        results.append(search(queries[i:i + 1]))
+    return (time.perf_counter() - start) * 1000 / len(queries), results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark filtered FAISS search")
+    parser.add_argument('--docs', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--index-type', choices=INDEX_TYPES, default='flat')
+    parser.add_argument('--nprobe', type=int, default=8)
+    parser.add_argument('--ef-search', type=int, default=64)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--exact-max', type=int, default=4096,
+                        help="Approximate indexes: score filters with at most this many matches exactly")
+    parser.add_argument('--selectivities', default='1,0.5,0.1,0.01,0.001',
+                        help="Comma-separated fractions of documents that pass the filter")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Clustered unit vectors, a rough stand-in for sentence embeddings
+    centers = rng.standard_normal((256, args.dim)).astype('float32')
+    vectors = centers[rng.integers(0, len(centers), args.docs)] + \
+        0.5 * rng.standard_normal((args.docs, args.dim)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(args.docs, args.queries, replace=False)] + \
+        0.05 * rng.standard_normal((args.queries, args.dim)).astype('float32')
+
+    index = build_index(vectors, args.index_type, ids=np.arange(args.docs, dtype=np.int64))
+    set_search_params(index, args.nprobe, args.ef_search)
+    k = args.k
+    unfiltered_ms, _ = timed(queries, lambda q: index.search(q, k))
+
+    print(f"\n--- {args.docs} docs, {args.index_type}, k={k}, {args.queries} queries; "
+          f"unfiltered {unfiltered_ms:.3f} ms/query ---")
+    print(f"{'selectivity':>12}{'matches':>9}{'method':>9}{'filtered ms':>13}{'full':>7}"
+          f"{'over-fetch k':>14}{'post-filter ms':>16}{'full':>7}")
+    for selectivity in (float(s) for s in args.selectivities.split(',')):
+        mask = rng.random(args.docs) < selectivity
+        matches = int(mask.sum())
+        wanted = min(k, matches)
+        id_filter = IdFilter(mask, 0 if args.index_type == 'flat' else args.exact_max)
+        filtered_ms, found = timed(queries, lambda q: id_filter.search(index, q, k, vectors)[1][0])
+        filtered_full = np.mean([(ids >= 0).sum() >= wanted for ids in found])
+
+        # Fetch enough neighbours that k should survive the filter on average
+        fetch = min(args.docs, math.ceil(k / selectivity))
+        post_ms, found = timed(queries, lambda q: index.search(q, fetch)[1][0])
+        post_full = np.mean([(mask[ids[ids >= 0]]).sum() >= wanted for ids in found])
+        method = 'subset' if id_filter.ids is not None else 'bitmap'
+        print(f"{selectivity:>12g}{matches:>9}{method:>9}{filtered_ms:>13.3f}{filtered_full:>7.0%}"
+              f"{fetch:>14}{post_ms:>16.3f}{post_full:>7.0%}")
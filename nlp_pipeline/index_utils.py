@@ -0,0 +1,265 @@
+# Helpers for building and loading the FAISS index
+#
+# 3_build_index.py can produce an exact Flat index or one of the approximate
+# (ANN) types below. The search-time knobs (nprobe for IVF, efSearch for
+# HNSW) are saved next to the index in faiss_index.json so the backend and
+# 4_search.py can load whatever the build step produced.
+#
+# sq8 / sqfp16 scan every vector like flat, but store them as 8-bit or
+# float16 codes (4x / 2x smaller), and any type can first reduce the vectors
+# with PCA. Such indexes only approximate distances, so they fetch `rescore`
+# times more candidates and re-score those exactly from the float32 rows of
+# embeddings.npy, which stays on disk and is memory-mapped.
+
+import json
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ['flat', 'ivfflat', 'ivfpq', 'hnsw', 'sq8', 'sqfp16']
+# Types that compare the query with every vector (a filter never empties a page)
+EXHAUSTIVE_TYPES = ('flat', 'sq8', 'sqfp16')
+# Types that store lossy codes rather than the float32 vectors
+COMPRESSED_TYPES = ('ivfpq', 'sq8', 'sqfp16')
+SCALAR_QUANTIZERS = {'sq8': faiss.ScalarQuantizer.QT_8bit, 'sqfp16': faiss.ScalarQuantizer.QT_fp16}
+
+
+def default_nlist(n):
+    """Rule of thumb: ~4*sqrt(n) lists, with at least ~39 training points each"""
+    return max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+def build_index(embeddings, index_type='flat', nlist=None, pq_m=16, pq_nbits=8,
+                hnsw_m=32, ef_construction=200, ids=None, pca_dim=None):
+    """Create, train and fill an index of the requested type.
+
+    With `pca_dim`, vectors are projected to that many dimensions (PCA fitted
+    on `embeddings`) before they reach the index. With `ids`, the index is
+    wrapped in an IndexIDMap so vectors keep their doc ids and can later be
+    added or removed one by one.
+    """
+    n, d_in = embeddings.shape
+    index_type = index_type.lower()
+    if pca_dim and not 0 < pca_dim < d_in:
+        raise ValueError(f"pca_dim={pca_dim} must be between 1 and the dimension {d_in}")
+    d = pca_dim or d_in
+
+    if index_type == 'flat':
+        index = faiss.IndexFlatL2(d)
+    elif index_type in SCALAR_QUANTIZERS:
+        index = faiss.IndexScalarQuantizer(d, SCALAR_QUANTIZERS[index_type], faiss.METRIC_L2)
+    elif index_type in ('ivfflat', 'ivfpq'):
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatL2(d)
+        if index_type == 'ivfflat':
+            index = faiss.IndexIVFFlat(quantizer, d, nlist)
+        else:
+            if d % pq_m != 0:
+                raise ValueError(f"pq_m={pq_m} must divide the dimension {d}")
+            # PQ training needs a few points per centroid; shrink codebooks on tiny corpora
+            pq_nbits = min(pq_nbits, max(1, int(math.log2(max(n // 39, 2)))))
+            index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_m, pq_nbits)
+        print(f"Training {index_type} with nlist={nlist} on {n} vectors...")
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(d, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+    if pca_dim:
+        index = faiss.IndexPreTransform(faiss.PCAMatrix(d_in, pca_dim), index)
+    if not index.is_trained:
+        # PCA, IVF centroids / PQ codebooks, or the scalar quantizer's value ranges
+        index.train(embeddings)
+
+    if ids is None:
+        index.add(embeddings)
+    else:
+        index = faiss.IndexIDMap(index)
+        index.add_with_ids(embeddings, ids)
+    return index
+
+
+def update_index(index, embeddings, live_ids):
+    """Bring an IndexIDMap in line with the live doc ids.
+
+    Only vectors for ids missing from the index are read from `embeddings`
+    (which may be a memory map). Raises RuntimeError for index types that
+    cannot remove vectors (HNSW); rebuild those instead.
+    """
+    indexed = faiss.vector_to_array(index.id_map)
+    removed = np.setdiff1d(indexed, live_ids)
+    added = np.setdiff1d(live_ids, indexed)
+    if removed.size:
+        index.remove_ids(removed)
+    if added.size:
+        index.add_with_ids(np.ascontiguousarray(embeddings[added], dtype='float32'), added)
+    return added, removed
+
+
+def base_index(index):
+    """The underlying index of IndexIDMap / PCA (IndexPreTransform) wrappers"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Apply search-time knobs to whichever index type this is"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and nprobe:
+        ivf.nprobe = int(nprobe)
+    hnsw = base_index(index)
+    if isinstance(hnsw, faiss.IndexHNSW) and ef_search:
+        hnsw.hnsw.efSearch = int(ef_search)
+    return index
+
+
+def make_selector(mask):
+    """FAISS id selector for a boolean mask over doc ids.
+
+    The mask is packed into a bitmap (one bit per id) that FAISS checks while
+    it scans, so only matching documents are ever returned.
+    """
+    bitmap = np.packbits(np.asarray(mask, dtype=bool), bitorder='little')
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    # The selector only holds a pointer; keep the bitmap alive with it
+    selector.referenced_objects = [bitmap]
+    return selector
+
+
+def search_params(index, selector=None, selectivity=1.0, nprobe=None, ef_search=None):
+    """Per-call SearchParameters of the right type for this index.
+
+    Passing parameters replaces the index's own nprobe / efSearch for that
+    call, so they are carried over unless overridden. With a filter
+    (`selectivity` = fraction of documents that pass it) the approximate
+    indexes search proportionally wider, since fewer of the vectors they
+    visit can be returned.
+    """
+    widen = 1.0 / max(selectivity, 1e-9)
+    ivf = faiss.try_extract_index_ivf(index)
+    hnsw = base_index(index)
+    if ivf is not None:
+        params = faiss.SearchParametersIVF()
+        params.nprobe = min(ivf.nlist, math.ceil(int(nprobe or ivf.nprobe) * widen))
+    elif isinstance(hnsw, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = min(hnsw.ntotal, math.ceil(int(ef_search or hnsw.hnsw.efSearch) * widen))
+    else:
+        params = faiss.SearchParameters()
+    params.sel = selector
+    return params
+
+
+def exact_search(vectors, ids, queries, k):
+    """Brute-force k nearest among vectors[ids], shaped like index.search output"""
+    distances = np.full((len(queries), k), np.inf, dtype='float32')
+    labels = np.full((len(queries), k), -1, dtype=np.int64)
+    n = min(k, len(ids))
+    if n:
+        subset = np.ascontiguousarray(vectors[ids], dtype='float32')
+        found_distances, found = faiss.knn(np.ascontiguousarray(queries, dtype='float32'), subset, n)
+        distances[:, :n] = found_distances
+        labels[:, :n] = ids[found]
+    return distances, labels
+
+
+def rescore(vectors, queries, labels, k):
+    """Exact squared L2 distances of candidate `labels` (rows of `vectors`); best k per query.
+
+    Shaped like index.search output, padded with -1 / inf.
+    """
+    distances = np.full((len(queries), k), np.inf, dtype='float32')
+    found = np.full((len(queries), k), -1, dtype=np.int64)
+    for i, candidates in enumerate(labels):
+        candidates = candidates[(candidates >= 0) & (candidates < len(vectors))]
+        if not len(candidates):
+            continue
+        exact = ((np.asarray(vectors[candidates], dtype='float32') - queries[i]) ** 2).sum(axis=1)
+        top = np.argsort(exact, kind='stable')[:k]
+        distances[i, :len(top)] = exact[top]
+        found[i, :len(top)] = candidates[top]
+    return distances, found
+
+
+def rescored_search(index, queries, k, vectors=None, factor=0, params=None):
+    """index.search, but with `factor` > 0 and `vectors` the top k * factor are re-scored exactly"""
+    if not factor or vectors is None:
+        return index.search(queries, k, params=params)
+    _, labels = index.search(queries, k * factor, params=params)
+    return rescore(vectors, queries, labels, k)
+
+
+class IdFilter:
+    """A doc-id filter, prepared once and reused across searches.
+
+    Exact (Flat) indexes skip non-matching ids during their scan. Approximate
+    indexes only visit part of the corpus, so when a filter is very selective
+    the few matching vectors may never be reached. When at most `exact_max`
+    documents match, their vectors are scored directly instead; otherwise the
+    index is searched with a proportionally wider nprobe / efSearch.
+    """
+
+    def __init__(self, mask, exact_max=0):
+        mask = np.asarray(mask, dtype=bool)
+        self.matches = int(mask.sum())
+        self.selectivity = self.matches / len(mask) if len(mask) else 0.0
+        self.selector = make_selector(mask)
+        self.bitmap = self.selector.referenced_objects[0]
+        self.ids = np.flatnonzero(mask) if self.matches <= exact_max else None
+
+    def contains(self, ids):
+        """Boolean array: which of these doc ids pass the filter"""
+        ids = np.asarray(ids, dtype=np.int64)
+        inside = ids < len(self.bitmap) * 8
+        passed = np.zeros(len(ids), dtype=bool)
+        ids = ids[inside]
+        passed[inside] = ((self.bitmap[ids >> 3] >> (ids & 7).astype(np.uint8)) & 1).astype(bool)
+        return passed
+
+    def search(self, index, queries, k, vectors=None, rescore_factor=0):
+        if self.ids is not None and vectors is not None:
+            return exact_search(vectors, self.ids, queries, k)
+        return rescored_search(index, queries, k, vectors, rescore_factor,
+                               params=search_params(index, self.selector, self.selectivity))
+
+
+def params_path(index_path):
+    return os.path.splitext(index_path)[0] + '.json'
+
+
+def save_index(index, index_path, params):
+    # Written next to the old file and swapped in, so processes that have the
+    # old index memory-mapped keep reading an intact copy
+    faiss.write_index(index, index_path + '.tmp')
+    os.replace(index_path + '.tmp', index_path)
+    with open(params_path(index_path), 'w', encoding='utf-8') as f:
+        json.dump(params, f, indent=2)
+
+
+def load_index(index_path, nprobe=None, ef_search=None, mmap=False, rescore_factor=None):
+    """Read an index and apply its saved search params, overridden by the arguments.
+
+    With mmap=True the vectors / inverted lists stay in the file and are paged
+    in on demand (read-only), so processes serving the same file share one
+    copy through the page cache.
+    """
+    if mmap:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    else:
+        index = faiss.read_index(index_path)
+    params = {'index_type': 'flat'}
+    if os.path.exists(params_path(index_path)):
+        with open(params_path(index_path), 'r', encoding='utf-8') as f:
+            params = json.load(f)
+    params['nprobe'] = nprobe or params.get('nprobe')
+    params['ef_search'] = ef_search or params.get('ef_search')
+    params['rescore'] = rescore_factor or params.get('rescore') or 0
+    set_search_params(index, params['nprobe'], params['ef_search'])
+    return index, params
@@ -0,0 +1,203 @@
+# BM25 inverted index for exact-term retrieval next to the FAISS index
+#
+# Sentence embeddings blur exact game titles, version numbers and studio
+# names. This index scores documents by BM25 over the same text we embed
+# (title + summary). It is stored in lexical_index/ as flat arrays that the
+# backend memory-maps:
+#
+#   vocab.txt     one term per line; line number = term id
+#   offsets.npy   int64, postings of term t are rows offsets[t]:offsets[t + 1]
+#   docs.npy      int32 doc ids (= FAISS ids), ascending within each term
+#   weights.npy   float32 BM25 contribution of the term to that document
+#                 (idf and length normalization already applied)
+#   meta.json     k1, b, document count, average length; written last
+#
+# A query looks up the postings of its few terms, adds up their weights per
+# document and keeps the top k, which takes microseconds. It is rebuilt in
+# full by 3_build_index.py, since BM25 statistics depend on the whole corpus.
+#
+#     python lexical_index.py --queries 500     # build into a temp dir and time queries
+
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from corpus_stream import CORPUS_FILE, read_corpus
+from manifest import document_text
+
+LEXICAL_DIR = 'lexical_index'
+# Version numbers (1.2.3) stay one token; everything else splits on non-word characters
+TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)+|\w+")
+# Too common to say anything about a document, and they have the longest postings
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were "
+    "will with you your".split()
+)
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _read_documents(pipeline_dir):
+    """(doc ids, texts) for the corpus, using the embedding text of each document"""
+    parquet_path = os.path.join(pipeline_dir, CORPUS_FILE)
+    if os.path.exists(parquet_path):
+        df = read_corpus(parquet_path, columns=['doc_id', 'title', 'summary']).to_pandas()
+        ids = df['doc_id'].to_numpy()
+    else:
+        df = pd.read_csv(os.path.join(pipeline_dir, 'all_data.csv'), usecols=['title', 'summary'], dtype=str)
+        ids = np.arange(len(df), dtype=np.int64)
+    df = df.fillna('')
+    return ids, [document_text(t, s) for t, s in zip(df['title'], df['summary'])]
+
+
+def build_lexical_index(pipeline_dir, output_dir=None, k1=1.2, b=0.75):
+    """Build lexical_index/ from the corpus"""
+    ids, texts = _read_documents(pipeline_dir)
+    return write_lexical_index(ids, texts, output_dir or os.path.join(pipeline_dir, LEXICAL_DIR), k1, b)
+
+
+def write_lexical_index(ids, texts, output_dir, k1=1.2, b=0.75):
+    """Index texts[i] as doc ids[i]; the previous index is swapped out only once this one is complete"""
+    ids = np.asarray(ids, dtype=np.int64)
+    vocab = {}
+    term_ids, doc_rows, tfs = [], [], []
+    lengths = np.zeros(len(texts), dtype=np.float32)
+    for row, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        lengths[row] = sum(counts.values())
+        for term, tf in counts.items():
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            doc_rows.append(row)
+            tfs.append(tf)
+
+    # Number the terms alphabetically, then sort postings by (term, doc id)
+    terms = sorted(vocab)
+    renumber = np.empty(len(vocab), dtype=np.int64)
+    renumber[[vocab[t] for t in terms]] = np.arange(len(terms))
+    term_ids = renumber[np.asarray(term_ids, dtype=np.int64)]
+    doc_rows = np.asarray(doc_rows, dtype=np.int64)
+    tfs = np.asarray(tfs, dtype=np.float32)
+    order = np.lexsort((ids[doc_rows], term_ids))
+    term_ids, doc_rows, tfs = term_ids[order], doc_rows[order], tfs[order]
+
+    n = len(texts)
+    avg_length = float(lengths.mean()) if n else 0.0
+    df_counts = np.bincount(term_ids, minlength=len(terms))
+    idf = np.log1p((n - df_counts + 0.5) / (df_counts + 0.5)).astype(np.float32)
+    norm = k1 * (1 - b + b * lengths[doc_rows] / max(avg_length, 1e-9))
+    weights = idf[term_ids] * tfs * (k1 + 1) / (tfs + norm)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(df_counts, out=offsets[1:])
+
+    tmp_dir = output_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    with open(os.path.join(tmp_dir, 'vocab.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(terms))
+    np.save(os.path.join(tmp_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(tmp_dir, 'docs.npy'), ids[doc_rows].astype(np.int32))
+    np.save(os.path.join(tmp_dir, 'weights.npy'), weights.astype(np.float32))
+    meta = {'k1': k1, 'b': b, 'documents': n, 'avg_length': avg_length,
+            'terms': len(terms), 'postings': int(len(doc_rows))}
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    old_dir = output_dir + '.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(output_dir):
+        os.replace(output_dir, old_dir)
+    os.replace(tmp_dir, output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return meta
+
+
+class LexicalIndex:
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(directory, 'vocab.txt'), 'r', encoding='utf-8') as f:
+            self.vocab = {term: i for i, term in enumerate(f.read().split('\n'))} if self.meta['terms'] else {}
+        self.offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode='r')
+        self.docs = np.load(os.path.join(directory, 'docs.npy'), mmap_mode='r')
+        self.weights = np.load(os.path.join(directory, 'weights.npy'), mmap_mode='r')
+
+    @classmethod
+    def load(cls, pipeline_dir):
+        """The pipeline's lexical index, or None if it has not been built"""
+        directory = os.path.join(pipeline_dir, LEXICAL_DIR)
+        if not os.path.exists(os.path.join(directory, 'meta.json')):
+            return None
+        return cls(directory)
+
+    def __len__(self):
+        return self.meta['documents']
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.docs.nbytes + self.weights.nbytes
+
+    def search(self, query, k, keep=None):
+        """(doc ids, BM25 scores) of the top k documents, best first.
+
+        `keep` optionally maps an array of doc ids to a boolean array of the
+        ones allowed (e.g. IdFilter.contains).
+        """
+        spans = []
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is not None:
+                spans.append((int(self.offsets[term_id]), int(self.offsets[term_id + 1])))
+        if not spans:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        docs = np.concatenate([self.docs[s:e] for s, e in spans])
+        weights = np.concatenate([self.weights[s:e] for s, e in spans])
+        if keep is not None:
+            allowed = keep(docs)
+            docs, weights = docs[allowed], weights[allowed]
+        # Sum each document's term weights
+        unique, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        if len(unique) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            unique, scores = unique[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return unique[order].astype(np.int64), scores[order]
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Build the BM25 index into a temp dir and time queries")
+    parser.add_argument('--queries', type=int, default=500, help="Document titles to use as queries")
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--scale', type=int, default=1,
+                        help="Index the corpus this many times over, to time a larger index")
+    args = parser.parse_args()
+
+    ids, texts = _read_documents('.')
+    ids = np.concatenate([ids + i * (int(ids.max()) + 1) for i in range(args.scale)])
+    texts = texts * args.scale
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        meta = write_lexical_index(ids, texts, os.path.join(tmp, LEXICAL_DIR))
+        build_s = time.perf_counter() - start
+        index = LexicalIndex(os.path.join(tmp, LEXICAL_DIR))
+        rng = np.random.default_rng(0)
+        queries = [texts[i].split('. ')[0] for i in rng.integers(0, len(texts), args.queries)]
+
+        start = time.perf_counter()
+        hits = sum(len(index.search(q, args.k)[0]) for q in queries)
+        us = (time.perf_counter() - start) * 1e6 / len(queries)
+        print(f"\n--- {meta['documents']} docs, {meta['terms']} terms, {meta['postings']} postings "
+              f"({index.nbytes / 1024:.1f} KB), built in {build_s:.2f}s ---")
+        print(f"{len(queries)} title queries, k={args.k}: {us:.1f} us/query, "
+              f"{hits / len(queries):.1f} hits/query")
@@ -0,0 +1,113 @@
+# Document manifest: stable doc ids for incremental embedding and indexing
+#
+# manifest.json records, for every URL in the corpus, the stable doc id it
+# was given and a hash of its embedding text. 1_consolidate_data.py assigns
+# the ids and writes them to the corpus' doc_id column; row `id` of
+# embeddings.npy holds that document's vector and FAISS uses the same id.
+# A document whose text changes gets a new id, so a refresh only has to embed
+# ids that are not in embeddings.npy yet. Ids of removed or changed documents
+# are never reused; their rows stay in embeddings.npy as dead rows until ids
+# are reset with `1_consolidate_data.py --reset-ids`. A dead row keeps the
+# document's old vector (it is zero only if the id was removed before it was
+# ever embedded), so anything reading embeddings.npy directly must select rows
+# with live_ids() rather than skip zero rows.
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def content_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def document_text(title, summary):
+    """The text we embed for a document"""
+    return f"{title}. {summary or ''}"
+
+
+class DocManifest:
+    def __init__(self, docs=None, next_id=0, epoch=None):
+        # url -> {'id': int, 'hash': str}
+        self.docs = docs or {}
+        self.next_id = next_id
+        # Changes whenever ids are renumbered, so embeddings built for an
+        # older numbering are never extended incrementally
+        self.epoch = epoch or time.time_ns()
+        self._seen = set()
+
+    @classmethod
+    def load(cls, path=MANIFEST_FILE):
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['docs'], data['next_id'], data.get('epoch'))
+
+    def save(self, path=MANIFEST_FILE):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'epoch': self.epoch, 'next_id': self.next_id, 'docs': self.docs}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def live_ids(self):
+        return np.array(sorted(doc['id'] for doc in self.docs.values()), dtype=np.int64)
+
+    def assign(self, url, text):
+        """Doc id for a document, issuing a new one if it is new or its text changed"""
+        self._seen.add(url)
+        digest = content_hash(text)
+        doc = self.docs.get(url)
+        if doc is None or doc['hash'] != digest:
+            doc = self.docs[url] = {'id': self.next_id, 'hash': digest}
+            self.next_id += 1
+        return doc['id']
+
+    def drop_unseen(self):
+        """Forget documents not assigned since loading; returns how many were dropped"""
+        unseen = [url for url in self.docs if url not in self._seen]
+        for url in unseen:
+            del self.docs[url]
+        return len(unseen)
+
+
+def append_rows(path, rows):
+    """Append rows to a 2-D .npy file in place, rewriting only its header.
+
+    Falls back to rewriting the whole file if the new shape does not fit in
+    the existing header padding.
+    """
+    rows = np.ascontiguousarray(rows)
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        header_start = f.tell()
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        data_start = f.tell()
+
+        if fortran_order or dtype != rows.dtype or shape[1:] != rows.shape[1:]:
+            raise ValueError(f"Cannot append {rows.dtype}{rows.shape} rows to {dtype}{shape} in {path}")
+
+        new_shape = (shape[0] + len(rows),) + tuple(shape[1:])
+        header = repr({'descr': np.lib.format.dtype_to_descr(dtype),
+                       'fortran_order': False, 'shape': new_shape})
+        # Header text sits after the 2- or 4-byte length field and ends with '\n'
+        text_start = header_start + (2 if version == (1, 0) else 4)
+        room = data_start - text_start
+        if len(header) + 1 <= room:
+            f.seek(text_start)
+            f.write((header.ljust(room - 1) + '\n').encode('latin1'))
+            f.seek(0, os.SEEK_END)
+            f.write(rows.tobytes())
+            return new_shape
+
+    existing = np.load(path)
+    np.save(path, np.concatenate([existing, rows]))
+    return new_shape
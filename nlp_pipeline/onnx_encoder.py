@@ -0,0 +1,284 @@
+# int8 ONNX Runtime version of the sentence embedding model
+#
+# Loading the PyTorch SentenceTransformer means importing torch, which
+# dominates the backend's cold start and memory, and the per-query forward
+# pass is the largest slice of search latency on CPU. `export` writes the
+# transformer as an ONNX graph with int8 dynamically quantized weights, plus
+# its tokenizer, to onnx_model/:
+#
+#   model.onnx      the quantized graph (input ids -> token embeddings)
+#   tokenizer.json  the fast (Rust) tokenizer, loaded with `tokenizers`
+#   encoder.json    pooling, normalization, max length and dimension
+#
+# OnnxEncoder then needs only onnxruntime, tokenizers and numpy. Pooling and
+# normalization are done in NumPy exactly as the SentenceTransformer modules
+# do them, and encode() has the same signature, so it is a drop-in for the
+# backend (ENCODER_BACKEND=onnx) and 4_search.py (--encoder onnx).
+#
+#     python onnx_encoder.py export      # needs torch + sentence-transformers + onnx
+#     python onnx_encoder.py parity      # exits with an error if below --min-cosine
+#     python onnx_encoder.py bench       # import time, memory, per-query latency
+
+import argparse
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from corpus_stream import CORPUS_FILE, read_corpus
+from manifest import document_text
+from parallel_encode import MODEL_NAME
+
+ONNX_DIR = 'onnx_model'
+POOLING_MODES = ('mean', 'cls')
+
+
+def export_onnx(model_name=MODEL_NAME, output_dir=ONNX_DIR, quantize=True):
+    """Export the SentenceTransformer's transformer to ONNX (int8 unless quantize=False)"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    pooling = next((m for m in model if isinstance(m, Pooling)), None)
+    if pooling is None:
+        pooling_mode = 'cls'
+    elif isinstance(getattr(pooling, 'pooling_mode', None), str):  # sentence-transformers >= 6
+        pooling_mode = pooling.pooling_mode
+    else:
+        pooling_mode = pooling.get_pooling_mode_str()
+    if pooling_mode not in POOLING_MODES:
+        raise ValueError(f"Pooling '{pooling_mode}' is not supported, only {POOLING_MODES}")
+
+    tmp_dir = output_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    input_names = list(tokenizer.model_input_names)
+    sample = tokenizer(["an example sentence", "a second, somewhat longer example sentence"],
+                       padding=True, return_tensors='pt')
+    axes = {0: 'batch', 1: 'tokens'}
+    fp32_path = os.path.join(tmp_dir, 'model_fp32.onnx')
+    export_args = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # The TorchScript exporter handles the dynamic batch / sequence axes of BERT models
+        export_args['dynamo'] = False
+
+    class TokenEmbeddings(torch.nn.Module):
+        # Keyword arguments, so the graph inputs don't depend on forward()'s argument order
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs)), return_dict=True).last_hidden_state
+
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(), tuple(sample[name] for name in input_names), fp32_path,
+            input_names=input_names, output_names=['token_embeddings'],
+            dynamic_axes={name: axes for name in input_names + ['token_embeddings']},
+            opset_version=14, **export_args,
+        )
+
+    model_path = os.path.join(tmp_dir, 'model.onnx')
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        # Weights to int8 ahead of time, activations quantized per batch at run time
+        quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+    else:
+        os.replace(fp32_path, model_path)
+
+    tokenizer.save_pretrained(tmp_dir)
+    config = {
+        'model_name': model_name,
+        'quantized': quantize,
+        'pooling': pooling_mode,
+        'normalize': any(isinstance(m, Normalize) for m in model),
+        'max_length': model.max_seq_length,
+        'dimension': model.get_sentence_embedding_dimension(),
+        'inputs': input_names,
+    }
+    with open(os.path.join(tmp_dir, 'encoder.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    return config
+
+
+class OnnxEncoder:
+    """SentenceTransformer-compatible encode() on ONNX Runtime"""
+
+    def __init__(self, model_dir=ONNX_DIR, threads=0):
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, 'encoder.json'), 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+        self.model_path = os.path.join(model_dir, 'model.onnx')
+        self.max_seq_length = self.config['max_length']
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(self.max_seq_length)
+        self.tokenizer.enable_padding()
+        self.threads = threads
+        # ONNX Runtime's thread pool does not survive a fork, so each process
+        # (e.g. every gunicorn worker) opens its own session on first use
+        self._session = None
+        self._session_pid = None
+
+    def get_sentence_embedding_dimension(self):
+        return self.config['dimension']
+
+    def set_num_threads(self, threads):
+        """Intra-op threads; takes effect when the session is next opened"""
+        self.threads = threads
+        self._session = None
+
+    def session(self):
+        if self._session is None or self._session_pid != os.getpid():
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            self._session = ort.InferenceSession(self.model_path, options, providers=['CPUExecutionProvider'])
+            self._session_pid = os.getpid()
+        return self._session
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """float32 embeddings, shape (len(sentences), dimension); like SentenceTransformer.encode"""
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        session = self.session()
+        inputs = [i.name for i in session.get_inputs()]
+        out = np.empty((len(sentences), self.config['dimension']), dtype=np.float32)
+        # Similar lengths in a batch keep padding down
+        order = np.argsort([len(s) for s in sentences], kind='stable')
+        for start in range(0, len(sentences), batch_size):
+            rows = order[start:start + batch_size]
+            encoded = self.tokenizer.encode_batch([sentences[i] for i in rows])
+            feed = {
+                'input_ids': np.array([e.ids for e in encoded], dtype=np.int64),
+                'attention_mask': np.array([e.attention_mask for e in encoded], dtype=np.int64),
+                'token_type_ids': np.array([e.type_ids for e in encoded], dtype=np.int64),
+            }
+            tokens = session.run(None, {name: feed[name] for name in inputs})[0]
+            out[rows] = self._pool(tokens, feed['attention_mask'])
+        return out[0] if single else out
+
+    def _pool(self, tokens, attention_mask):
+        if self.config['pooling'] == 'cls':
+            pooled = tokens[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (tokens * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.config['normalize']:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+
+def load_encoder(backend, model_name=MODEL_NAME, onnx_dir=ONNX_DIR):
+    """The query encoder for a backend name: 'torch' (SentenceTransformer) or 'onnx'"""
+    if backend == 'onnx':
+        return OnnxEncoder(onnx_dir)
+    if backend == 'torch':
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    raise ValueError(f"Unknown encoder backend '{backend}', expected 'torch' or 'onnx'")
+
+
+def _sample_texts(count):
+    """Corpus document texts plus their titles alone, which look like queries"""
+    if os.path.exists(CORPUS_FILE):
+        df = read_corpus(columns=['title', 'summary']).to_pandas()
+    else:
+        import pandas as pd
+        df = pd.read_csv('all_data.csv', usecols=['title', 'summary'], dtype=str)
+    df = df.fillna('').sample(min(count, len(df)), random_state=0)
+    return [document_text(t, s) for t, s in zip(df['title'], df['summary'])] + df['title'].tolist()
+
+
+def _rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def _measure(backend, model_name, onnx_dir, queries):
+    """Run in a fresh interpreter: time to first embedding, RSS and single-query latency as JSON"""
+    texts = _sample_texts(queries)[-queries:]
+    start = time.perf_counter()
+    # Includes the imports, and the ONNX session that is opened on first use
+    model = load_encoder(backend, model_name, onnx_dir)
+    model.encode(texts[:1])
+    load_s = time.perf_counter() - start
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        model.encode([text], batch_size=1)
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(json.dumps({'load_s': load_s, 'rss_mb': _rss_mb(), 'p50_ms': float(np.percentile(latencies, 50)),
+                      'p95_ms': float(np.percentile(latencies, 95))}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export, check and benchmark the ONNX query encoder")
+    parser.add_argument('command', choices=['export', 'parity', 'bench', '_measure'])
+    parser.add_argument('--model', default=MODEL_NAME)
+    parser.add_argument('--output-dir', default=ONNX_DIR)
+    parser.add_argument('--no-quantize', action='store_true', help="Export float32 weights")
+    parser.add_argument('--texts', type=int, default=200, help="Corpus documents to compare / time")
+    parser.add_argument('--min-cosine', type=float, default=0.98,
+                        help="parity: fail if any embedding is less similar than this to PyTorch's")
+    parser.add_argument('--backend', default='onnx')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        config = export_onnx(args.model, args.output_dir, quantize=not args.no_quantize)
+        size = os.path.getsize(os.path.join(args.output_dir, 'model.onnx')) / 2**20
+        print(f"Saved {'int8' if config['quantized'] else 'float32'} ONNX model ({size:.1f} MB) "
+              f"and tokenizer to {args.output_dir}/")
+
+    elif args.command == 'parity':
+        from sentence_transformers import SentenceTransformer
+
+        texts = _sample_texts(args.texts)
+        reference = SentenceTransformer(args.model, device='cpu').encode(texts, batch_size=32)
+        reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+        onnx = OnnxEncoder(args.output_dir).encode(texts, batch_size=32)
+        onnx /= np.linalg.norm(onnx, axis=1, keepdims=True)
+        cosine = (reference * onnx).sum(axis=1)
+        # Do queries still find the same nearest document?
+        docs = len(texts) // 2
+        same_top = np.mean((reference[docs:] @ reference[:docs].T).argmax(axis=1) ==
+                           (onnx[docs:] @ reference[:docs].T).argmax(axis=1))
+        print(f"--- {len(texts)} texts: cosine to PyTorch min {cosine.min():.4f}, mean {cosine.mean():.4f}; "
+              f"same top-1 document for {same_top:.1%} of title queries ---")
+        if cosine.min() < args.min_cosine:
+            sys.exit(f"Parity check failed: min cosine {cosine.min():.4f} < {args.min_cosine}")
+        print("Parity check passed.")
+
+    elif args.command == 'bench':
+        print(f"--- {args.texts} single-title queries; load = imports + model load + first query ---")
+        print(f"{'backend':>8}{'load s':>9}{'RSS MB':>9}{'p50 ms':>9}{'p95 ms':>9}")
+        for backend in ('torch', 'onnx'):
+            # A fresh interpreter each, so import time and memory are cold
+            out = subprocess.run(
+                [sys.executable, __file__, '_measure', '--backend', backend, '--model', args.model,
+                 '--output-dir', args.output_dir, '--texts', str(args.texts)],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            r = json.loads(out)
+            print(f"{backend:>8}{r['load_s']:>9.2f}{r['rss_mb']:>9.0f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}")
+
+    else:
+        _measure(args.backend, args.model, args.output_dir, args.texts)
@@ -0,0 +1,140 @@
+# Parallel embedding generation
+#
+# Texts are sorted by token length and cut into chunks, so every batch a
+# worker encodes holds sentences of similar length and little compute is
+# wasted on padding. Chunks are spread over a pool of processes, each with
+# its own copy of the model and its share of the CPU threads, and every
+# worker writes its vectors straight into the output .npy memmap at the rows
+# it was given, so no embeddings are pickled back to the parent.
+#
+# Run this file directly to benchmark throughput for 1, 2, 4 and N workers:
+#     python parallel_encode.py --docs 2000
+
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import numpy as np
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Per-process state, set up by _init_worker
+_model = None
+_output = None
+
+
+def _init_worker(model_name, output_path, threads):
+    global _model, _output
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)
+    _model = SentenceTransformer(model_name, device='cpu')
+    _output = np.load(output_path, mmap_mode='r+')
+
+
+def _encode_chunk(task):
+    rows, texts, batch_size = task
+    vectors = _model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+    _output[rows] = vectors
+    _output.flush()
+    return len(rows)
+
+
+def token_lengths(model, texts):
+    """Token count of each text, as the model's tokenizer sees it"""
+    tokenizer = getattr(model, 'tokenizer', None)
+    if tokenizer is None:
+        return np.fromiter((len(t.split()) for t in texts), dtype=np.int64, count=len(texts))
+    encoded = tokenizer(list(texts), add_special_tokens=True, truncation=True,
+                        max_length=getattr(model, 'max_seq_length', 256))
+    return np.fromiter((len(ids) for ids in encoded['input_ids']), dtype=np.int64, count=len(texts))
+
+
+def encode_into(output_path, rows, texts, workers=1, batch_size=64, chunk_size=1024,
+                model_name=MODEL_NAME, lengths=None, model=None):
+    """Encode texts[i] into row rows[i] of the float32 .npy file at output_path.
+
+    The file must already exist with the right shape (np.lib.format.open_memmap).
+    With one worker, an already loaded `model` is reused in-process.
+    Returns the throughput in docs/sec.
+    """
+    global _model, _output
+    rows = np.asarray(rows, dtype=np.int64)
+    if lengths is None:
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    order = np.argsort(lengths, kind='stable')
+    tasks = [
+        (rows[order[i:i + chunk_size]], [texts[j] for j in order[i:i + chunk_size]], batch_size)
+        for i in range(0, len(order), chunk_size)
+    ]
+
+    workers = max(1, int(workers))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    start = time.perf_counter()
+    done = 0
+    if workers == 1:
+        if model is None:
+            _init_worker(model_name, output_path, threads)
+        else:
+            _model, _output = model, np.load(output_path, mmap_mode='r+')
+        results = map(_encode_chunk, tasks)
+        pool = None
+    else:
+        pool = mp.get_context('spawn').Pool(workers, _init_worker, (model_name, output_path, threads))
+        results = pool.imap_unordered(_encode_chunk, tasks)
+    try:
+        for count in results:
+            done += count
+            elapsed = time.perf_counter() - start
+            print(f"\r  {done}/{len(rows)} documents, {done / elapsed:.1f} docs/sec", end='', flush=True)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    print()
+    elapsed = time.perf_counter() - start
+    return len(rows) / elapsed if elapsed else 0.0
+
+
+def benchmark(texts, worker_counts, batch_size=64, model_name=MODEL_NAME):
+    """docs/sec for each worker count, encoding into a throwaway memmap"""
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device='cpu')
+    d = model.get_sentence_embedding_dimension()
+    lengths = token_lengths(model, texts)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.npy')
+        np.lib.format.open_memmap(path, mode='w+', dtype='float32', shape=(len(texts), d)).flush()
+        for workers in worker_counts:
+            print(f"{workers} worker(s):")
+            # Wall time includes each worker loading its own model, as in a real run
+            results[workers] = encode_into(path, np.arange(len(texts)), texts, workers,
+                                           batch_size=batch_size, model_name=model_name, lengths=lengths)
+    return results
+
+
+if __name__ == '__main__':
+    from corpus_stream import read_corpus
+    from manifest import document_text
+
+    parser = argparse.ArgumentParser(description="Benchmark embedding throughput by worker count")
+    parser.add_argument('--docs', type=int, default=2000, help="Corpus documents to encode per run")
+    parser.add_argument('--workers', default=None, help="Comma-separated worker counts (default 1,2,4,N)")
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    df = read_corpus(columns=['title', 'summary']).to_pandas().head(args.docs)
+    texts = [document_text(t, s) for t, s in zip(df['title'], df['summary'])]
+    cpus = os.cpu_count() or 1
+    counts = [int(w) for w in args.workers.split(',')] if args.workers else sorted({1, 2, 4, cpus})
+
+    results = benchmark(texts, counts, args.batch_size)
+    print(f"\n--- {len(texts)} documents, {cpus} CPUs ---")
+    print(f"{'workers':>8}{'docs/sec':>12}{'speedup':>10}")
+    for workers, rate in results.items():
+        print(f"{workers:>8}{rate:>12.1f}{rate / results[counts[0]]:>10.2f}")
@@ -2,5 +2,5 @@
 cd "D:\8th mid perp\gaming-search-engine\crawler"
 call ..\venv\Scripts\activate
 echo "Starting jobs crawler (append mode)..."
-scrapy crawl workwithindies_jobs -o workwithindies_jobs.json -s FEED_OVERWRITE=False
+python run_all.py --spiders workwithindies_jobs,gamedev_jobs --skip-deep --skip-reddit
 deactivate
\ No newline at end of file